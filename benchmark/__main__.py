@@ -0,0 +1,173 @@
+import argparse
+import copy
+import json
+import os
+import tempfile
+import time
+import numpy as np
+from python_utils.functions import cprint
+from python_utils.logging import setup_logging
+from underwrite.batch import underwrite_batch
+from underwrite.config import load_config
+from underwrite.profiler import Profiler
+from underwrite.underwriter import Underwriter
+from .server import StandInServer
+
+MODES = ["single", "concurrent", "batch"]
+
+def parse_args():
+  parser = argparse.ArgumentParser(description="Time underwriting against stand-in PropStream, Compass and Redfin pages.")
+  parser.add_argument("--modes", default=",".join(MODES), help=f"Comma-separated modes to run: {', '.join(MODES)}")
+  parser.add_argument("--properties", type=int, default=10, help="Number of addresses underwritten per mode")
+  parser.add_argument("--workers", type=int, default=2, help="Number of workers in batch mode")
+  parser.add_argument("--latency", type=int, default=50, help="Milliseconds every stand-in response is held back")
+  parser.add_argument("--jitter", type=int, default=25, help="Up to this many more milliseconds, at random")
+  parser.add_argument("--missing", default="", help="Comma-separated site.field names to leave off every page, e.g. compass.pool")
+  parser.add_argument("--missing-rate", type=float, default=0, help="Chance of leaving off each other optional field")
+  parser.add_argument("--output", metavar="FILE", default="benchmark.json", help="Where to write the results")
+  return parser.parse_args()
+# end of parse_args
+
+def benchmark_config(config, url, directory, concurrent):
+  # Point every site at the stand-in server and keep sessions, the Redfin
+  # index and the cache from leaking between modes or into real runs
+  config = copy.deepcopy(config)
+  config["propstream"].update({"url": f"{url}propstream/", "email": "benchmark@example.com", "password": "benchmark"})
+  config["compass"].update({"url": f"{url}compass/", "email": "benchmark@example.com", "password": "benchmark"})
+  config["redfin"].update({"url": f"{url}redfin/", "index": os.path.join(directory, "redfin_index.json")})
+  config["browser"].update({"profile": "fast", "concurrent": concurrent})
+  config["sessions"].update({"enabled": True, "directory": os.path.join(directory, "sessions")})
+  config["cache"]["enabled"] = False
+  # The stand-in sites have no accounts to get throttled
+  for name in ("propstream", "compass", "redfin"):
+    config["scheduler"][name].update({"per_minute": 60000, "burst": 1000})
+  return config
+# end of benchmark_config
+
+def command_count(profiler):
+  return sum(entry["count"] for entry in profiler.report()["commands"].values())
+# end of command_count
+
+def run_underwriter(config, addresses):
+  # Browsers are started before the clock starts, so latencies are for the
+  # lookups alone
+  profiler = Profiler()
+  underwriter = Underwriter(config, profiler)
+  latencies = []
+  errors = 0
+  try:
+    start = time.perf_counter()
+    underwriter.start()
+    startup_seconds = time.perf_counter() - start
+    startup_commands = command_count(profiler)
+    for property_address in addresses:
+      start = time.perf_counter()
+      try:
+        underwriter.underwrite(property_address)
+      except Exception as e:
+        cprint(f"<r>{property_address}: {e}")
+        errors += 1
+      latencies.append(time.perf_counter() - start)
+  finally:
+    underwriter.close()
+  return {
+    "startup_seconds": startup_seconds,
+    "latencies": latencies,
+    "errors": errors,
+    "commands": command_count(profiler) - startup_commands,
+    "profile": profiler.report()
+  }
+# end of run_underwriter
+
+def run_batch(config, addresses, workers):
+  # Workers start their browsers on their first address, so each worker's
+  # first latency includes its start-up, and so do the command counts
+  profiler = Profiler()
+  latencies = []
+  errors = 0
+  for result in underwrite_batch(config, addresses, workers, profiler):
+    # Addresses lost with a crashed worker have no latency
+    if result["elapsed_seconds"] is not None:
+      latencies.append(result["elapsed_seconds"])
+    if "error" in result:
+      cprint(f"<r>{result['property_address']}: {result['error']}")
+      errors += 1
+  return {
+    "startup_seconds": None,
+    "latencies": latencies,
+    "errors": errors,
+    "commands": command_count(profiler),
+    "profile": profiler.report()
+  }
+# end of run_batch
+
+def summarize(mode, run, wall_seconds):
+  latencies = np.array(run["latencies"])
+  return {
+    "mode": mode,
+    "properties": len(latencies),
+    "errors": run["errors"],
+    "wall_seconds": wall_seconds,
+    "startup_seconds": run["startup_seconds"],
+    "p50_seconds": float(np.percentile(latencies, 50)),
+    "p95_seconds": float(np.percentile(latencies, 95)),
+    "mean_seconds": float(latencies.mean()),
+    "properties_per_minute": len(latencies) / wall_seconds * 60,
+    "commands": run["commands"],
+    "commands_per_property": run["commands"] / len(latencies),
+    "profile": run["profile"]
+  }
+# end of summarize
+
+def main():
+  setup_logging()
+  args = parse_args()
+  config = load_config("config.json")
+  modes = [mode for mode in args.modes.split(",") if mode]
+  for mode in modes:
+    if mode not in MODES:
+      cprint(f"<r>Unknown mode {mode}, expected one of {', '.join(MODES)}")
+      return
+  addresses = [f"{100 + i} Benchmark St, Testville, CA 9{i % 10000:04d}" for i in range(args.properties)]
+  missing = [field for field in args.missing.split(",") if field]
+
+  standin = StandInServer(latency_ms=args.latency, jitter_ms=args.jitter, missing=missing, missing_rate=args.missing_rate).start()
+  cprint(f"<g>Stand-in sites on {standin.url}")
+  summaries = []
+  try:
+    for mode in modes:
+      with tempfile.TemporaryDirectory() as directory:
+        mode_config = benchmark_config(config, standin.url, directory, concurrent=mode == "concurrent")
+        cprint(f"<g>Running {mode} mode on {len(addresses)} properties...")
+        start = time.perf_counter()
+        if mode == "batch":
+          run = run_batch(mode_config, addresses, args.workers)
+        else:
+          run = run_underwriter(mode_config, addresses)
+        summaries.append(summarize(mode, run, time.perf_counter() - start))
+  finally:
+    standin.stop()
+
+  for summary in summaries:
+    cprint(
+      f"<g>{summary['mode']:<10} p50 {summary['p50_seconds']:6.2f}s  p95 {summary['p95_seconds']:6.2f}s  "
+      f"{summary['properties_per_minute']:6.1f}/min  {summary['commands_per_property']:6.1f} commands/property  "
+      f"{summary['errors']} errors"
+    )
+  with open(args.output, "w", encoding="utf-8") as f:
+    json.dump({
+      "settings": {
+        "properties": args.properties,
+        "workers": args.workers,
+        "latency_ms": args.latency,
+        "jitter_ms": args.jitter,
+        "missing": missing,
+        "missing_rate": args.missing_rate
+      },
+      "results": summaries
+    }, f, indent=2)
+  cprint(f"<g>Results written to \"{args.output}\"")
+# end of main
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,232 @@
+import argparse
+import datetime
+import json
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, unquote, urlsplit
+from python_utils.functions import cprint
+
+FIXTURES_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+# Fields each page can be served without, as "site.field". Leaving one out
+# is how listings that simply lack a field are reproduced.
+OPTIONAL_FIELDS = [
+  "propstream.mortgage", "propstream.distressed", "propstream.owner_status", "propstream.square_footage",
+  "propstream.bedrooms", "propstream.bathrooms", "propstream.average_sale_price",
+  "compass.remarks", "compass.agent", "compass.courtesy", "compass.days_on_market", "compass.pool",
+  "redfin.remarks", "redfin.agent", "redfin.days_on_market"
+]
+
+def property_data(property_address):
+  # Every address gets the same made-up property every time, so runs can be
+  # compared with each other
+  rng = random.Random(property_address)
+  year_built = rng.randint(1915, 2015)
+  square_footage = rng.randint(900, 3200)
+  price_per_sqft = rng.randint(250, 650)
+  comps = []
+  for i in range(rng.randint(8, 30)):
+    comp_sqft = int(square_footage * rng.uniform(0.8, 1.2))
+    comps.append({
+      "address": f"{rng.randint(100, 9999)} Comp {i + 1} St",
+      "sale_date": (datetime.date.today() - datetime.timedelta(days=rng.randint(7, 540))).strftime("%m/%d/%Y"),
+      "sale_price": f"${int(comp_sqft * price_per_sqft * rng.uniform(0.9, 1.1)):,}",
+      "square_footage": f"{comp_sqft:,}",
+      "bedrooms": rng.randint(2, 5),
+      "bathrooms": rng.randint(1, 4),
+      "year_built": year_built + rng.randint(-10, 10),
+      "distance": round(rng.uniform(0.05, 1.5), 2)
+    })
+  # Most listings are on both sites, some only on Redfin, some on neither
+  listed_on = rng.choices(["compass", "redfin", "none"], weights=[6, 3, 1])[0]
+  return {
+    "address": property_address,
+    "owner": f"Owner {rng.randint(1, 999)}",
+    "mortgage": f"${rng.randint(0, 600) * 1000:,}",
+    "distressed": rng.choice(["No", "Pre-Foreclosure", "Tax Delinquent"]),
+    "owner_status": rng.choice(["Owner Occupied", "Absentee Owner"]),
+    "year_built": year_built,
+    "square_footage": f"{square_footage:,}",
+    "bedrooms": rng.randint(2, 5),
+    "bathrooms": rng.randint(1, 4),
+    "average_sale_price": f"${square_footage * price_per_sqft:,}",
+    "comps": comps,
+    "listed_on": listed_on,
+    "mls_number": f"SR{rng.randint(10000000, 99999999)}",
+    "ask_price": f"${int(square_footage * price_per_sqft * rng.uniform(0.8, 1.1)):,}",
+    "remarks": "Charming home with great bones. Bring your contractor.",
+    "agent": f"Agent {rng.randint(1, 999)}",
+    "brokerage": f"Brokerage {rng.randint(1, 99)}",
+    "dre": f"0{rng.randint(1000000, 2999999)}",
+    "phone": f"{rng.randint(200, 999)}.{rng.randint(200, 999)}.{rng.randint(1000, 9999)}",
+    "email": f"agent{rng.randint(1, 999)}@example.com",
+    "days_on_market": rng.randint(1, 120),
+    "pool": rng.choice(["Yes", "No"])
+  }
+# end of property_data
+
+class StandInServer:
+  # Serves pages shaped like the ones PropStream, Compass and Redfin show
+  # while a property is underwritten, under /propstream/, /compass/ and
+  # /redfin/. Every response is held back by latency_ms (plus up to
+  # jitter_ms). Fields in missing are left off every page, and each other
+  # optional field is left off with probability missing_rate.
+
+  def __init__(self, host="127.0.0.1", port=0, latency_ms=0, jitter_ms=0, missing=(), missing_rate=0):
+    self.latency_ms = latency_ms
+    self.jitter_ms = jitter_ms
+    self.missing = set(missing)
+    self.missing_rate = missing_rate
+    self.fixtures = {}
+    for name in os.listdir(FIXTURES_DIRECTORY):
+      with open(os.path.join(FIXTURES_DIRECTORY, name), "r", encoding="utf-8") as f:
+        self.fixtures[name[:-len(".html")]] = f.read()
+    self.server = ThreadingHTTPServer((host, port), handler(self))
+    self.server.daemon_threads = True
+    self.url = f"http://{host}:{self.server.server_address[1]}/"
+    self.thread = None
+
+  def start(self):
+    self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+    self.thread.start()
+    return self
+  # end of start
+
+  def stop(self):
+    self.server.shutdown()
+    self.server.server_close()
+  # end of stop
+
+  def delay(self):
+    latency = self.latency_ms + random.uniform(0, self.jitter_ms)
+    if latency > 0:
+      time.sleep(latency / 1000)
+  # end of delay
+
+  def missing_fields(self, site, property_address):
+    rng = random.Random(f"{property_address}|missing")
+    return {
+      field.split(".", 1)[1]
+      for field in OPTIONAL_FIELDS
+      if field.startswith(f"{site}.") and (field in self.missing or rng.random() < self.missing_rate)
+    }
+  # end of missing_fields
+
+  def render(self, fixture, values, missing=()):
+    html = self.fixtures[fixture]
+    for field in missing:
+      html = re.sub(rf"<!--field:{field}-->.*?<!--/field:{field}-->", "", html, flags=re.S)
+    return re.sub(r"\{\{(\w+)\}\}", lambda match: str(values.get(match.group(1), "")), html)
+  # end of render
+
+  def autocomplete(self, property_address):
+    data = property_data(property_address)
+    payload = {}
+    if data["listed_on"] != "none":
+      payload["exactMatch"] = {"name": property_address, "url": f"/redfin/home/{quote(property_address, safe='')}"}
+    return "{}&&" + json.dumps({"errorMessage": "Success", "resultCode": 0, "payload": payload})
+  # end of autocomplete
+
+def handler(standin):
+  class Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+      standin.delay()
+      url = urlsplit(self.path)
+      query = {key: values[0] for key, values in parse_qs(url.query).items()}
+      path = url.path
+      cookies = self.headers.get("Cookie", "")
+
+      if path == "/propstream/":
+        if "propstream_session=1" in cookies:
+          self.redirect("/propstream/app")
+        else:
+          self.html(standin.render("propstream_login", {}))
+      elif path.startswith("/propstream/app"):
+        if "username" in query:
+          self.redirect("/propstream/app", "propstream_session=1; Path=/")
+        elif "propstream_session=1" not in cookies:
+          self.redirect("/propstream/")
+        else:
+          self.html(standin.render("propstream_app", {"base": "/propstream/"}))
+      elif path.startswith("/propstream/fragments/"):
+        self.propstream_fragment(path.rsplit("/", 1)[1], query.get("address", ""))
+      elif path == "/compass/":
+        missing = ["log_in"] if "compass_session=1" in cookies else []
+        self.html(standin.render("compass_home", {"base": "/compass/"}, missing))
+      elif path == "/compass/listing":
+        property_address = query.get("address", "")
+        data = property_data(property_address)
+        if data["listed_on"] == "compass":
+          self.html(standin.render("compass_listing", data, standin.missing_fields("compass", property_address)))
+        else:
+          self.html(standin.render("compass_no_results", data))
+      elif path == "/redfin/stingray/do/location-autocomplete":
+        self.send("application/json", standin.autocomplete(query.get("location", "")))
+      elif path.startswith("/redfin/home/"):
+        property_address = unquote(path[len("/redfin/home/"):])
+        data = property_data(property_address)
+        self.html(standin.render("redfin_listing", data, standin.missing_fields("redfin", property_address)))
+      else:
+        self.send_error(404)
+
+    def propstream_fragment(self, fragment, property_address):
+      data = property_data(property_address)
+      missing = standin.missing_fields("propstream", property_address)
+      if fragment == "search":
+        self.html(standin.render("propstream_search", data))
+      elif fragment == "details":
+        self.html(standin.render("propstream_details", data, missing))
+      elif fragment == "comps":
+        rows = "".join(standin.render("propstream_comp_row", {**comp, "index": i}) for i, comp in enumerate(data["comps"]))
+        # ag-grid counts its header row in aria-rowcount
+        self.html(standin.render("propstream_comps", {**data, "rows": rows, "row_count": len(data["comps"]) + 1}, missing))
+      else:
+        self.send_error(404)
+
+    def redirect(self, location, cookie=None):
+      self.send_response(302)
+      self.send_header("Location", location)
+      if cookie:
+        self.send_header("Set-Cookie", cookie)
+      self.send_header("Content-Length", "0")
+      self.end_headers()
+
+    def html(self, body):
+      self.send("text/html; charset=utf-8", body)
+
+    def send(self, content_type, body):
+      data = body.encode("utf-8")
+      self.send_response(200)
+      self.send_header("Content-Type", content_type)
+      self.send_header("Content-Length", str(len(data)))
+      self.end_headers()
+      self.wfile.write(data)
+
+    def log_message(self, format, *args):
+      pass
+  return Handler
+# end of handler
+
+def parse_args():
+  parser = argparse.ArgumentParser(description="Serve stand-in PropStream, Compass and Redfin pages.")
+  parser.add_argument("--port", type=int, default=8766)
+  parser.add_argument("--latency", type=int, default=0, help="Milliseconds every response is held back")
+  parser.add_argument("--jitter", type=int, default=0, help="Up to this many more milliseconds, at random")
+  parser.add_argument("--missing", default="", help="Comma-separated site.field names to leave off every page")
+  parser.add_argument("--missing-rate", type=float, default=0, help="Chance of leaving off each other optional field")
+  return parser.parse_args()
+# end of parse_args
+
+def main():
+  args = parse_args()
+  missing = [field for field in args.missing.split(",") if field]
+  standin = StandInServer(port=args.port, latency_ms=args.latency, jitter_ms=args.jitter, missing=missing, missing_rate=args.missing_rate)
+  cprint(f"<g>Serving stand-in sites on {standin.url}")
+  standin.server.serve_forever()
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,102 @@
+from decimal import Decimal
+from urllib.parse import quote
+import pytest
+import requests
+from benchmark.server import StandInServer, property_data
+from underwrite.compass import COMPASS_LISTING_FIELDS
+from underwrite.extract import extract_html, extract_table_html
+from underwrite.propstream import PROPSTREAM_COMPS_FIELDS, PROPSTREAM_COMPS_TABLE, PROPSTREAM_DETAILS_FIELDS, PROPSTREAM_SUMMARY_FIELDS
+from underwrite.redfin import REDFIN_LISTING_FIELDS
+
+# The field specs run against the stand-in pages the benchmark serves, so a
+# spec that stops matching its page fails here instead of in a browser
+
+PROPERTY_ADDRESS = "123 Main St, Springfield, IL 62704"
+
+def find_address(listed_on):
+  # The stand-in decides where an address is listed, so pick one that's on the wanted site
+  for i in range(1000):
+    property_address = f"{i} Main St, Springfield, IL 62704"
+    if property_data(property_address)["listed_on"] == listed_on:
+      return property_address
+  raise AssertionError(f"No stand-in address is listed on {listed_on}")
+# end of find_address
+
+@pytest.fixture(scope="module")
+def standin():
+  standin = StandInServer().start()
+  yield standin
+  standin.stop()
+
+def get(standin, path, property_address):
+  response = requests.get(f"{standin.url}{path}{quote(property_address, safe='')}", timeout=10)
+  response.raise_for_status()
+  return response.text
+# end of get
+
+def test_propstream_details(standin):
+  data = property_data(PROPERTY_ADDRESS)
+  details = extract_html(get(standin, "propstream/fragments/details?address=", PROPERTY_ADDRESS), PROPSTREAM_DETAILS_FIELDS)
+  assert details == {"owner": data["owner"], "mortgage": data["mortgage"]}
+
+def test_propstream_summary(standin):
+  data = property_data(PROPERTY_ADDRESS)
+  summary = extract_html(get(standin, "propstream/fragments/comps?address=", PROPERTY_ADDRESS), PROPSTREAM_SUMMARY_FIELDS)
+  assert summary == {
+    "distressed": data["distressed"],
+    "owner_status": data["owner_status"],
+    "year_built": data["year_built"],
+    "square_footage": int(data["square_footage"].replace(",", "")),
+    "bedrooms": data["bedrooms"],
+    "bathrooms": float(data["bathrooms"])
+  }
+
+def test_propstream_comps(standin):
+  data = property_data(PROPERTY_ADDRESS)
+  html = get(standin, "propstream/fragments/comps?address=", PROPERTY_ADDRESS)
+  assert extract_html(html, PROPSTREAM_COMPS_FIELDS) == {"average_sale_price": Decimal(data["average_sale_price"].strip("$").replace(",", ""))}
+  columns = extract_table_html(html, PROPSTREAM_COMPS_TABLE)
+  assert set(columns) == set(PROPSTREAM_COMPS_TABLE["columns"])
+  for name, values in columns.items():
+    assert [value.strip() for value in values] == [str(comp[name]) for comp in data["comps"]]
+
+def test_propstream_missing_fields():
+  # Fields the page leaves off fall back to their defaults
+  standin = StandInServer()
+  try:
+    details = extract_html(standin.render("propstream_details", property_data(PROPERTY_ADDRESS), {"mortgage"}), PROPSTREAM_DETAILS_FIELDS)
+    comps = extract_html(standin.render("propstream_comps", {**property_data(PROPERTY_ADDRESS), "rows": ""}, {"average_sale_price"}), PROPSTREAM_COMPS_FIELDS)
+  finally:
+    standin.server.server_close()
+  assert details["mortgage"] == ""
+  assert comps["average_sale_price"] == "N/A"
+
+def test_compass_listing(standin):
+  property_address = find_address("compass")
+  data = property_data(property_address)
+  listing = extract_html(get(standin, "compass/listing?address=", property_address), COMPASS_LISTING_FIELDS)
+  assert listing == {
+    "remarks": data["remarks"],
+    "listing_agent": data["agent"],
+    "listing_brokerage": data["brokerage"],
+    "listing_agent_dre": f"DRE #{data['dre']}",
+    "listing_agent_phone": f"P: {data['phone']}",
+    "listing_agent_email": data["email"],
+    "courtesy": f"Listing Courtesy of {data['brokerage']}",
+    "ask_price": data["ask_price"],
+    "days_on_market": str(data["days_on_market"]),
+    "pool": data["pool"]
+  }
+
+def test_redfin_listing(standin):
+  property_address = find_address("redfin")
+  data = property_data(property_address)
+  listing = extract_html(get(standin, "redfin/home/", property_address), REDFIN_LISTING_FIELDS)
+  assert listing == {
+    "remarks": data["remarks"],
+    "listing_agent": data["agent"],
+    "listing_brokerage": data["brokerage"],
+    "listing_agent_dre": f"DRE #{data['dre']}",
+    "ask_price": data["ask_price"],
+    "days_on_market": str(data["days_on_market"])
+  }
@@ -1,465 +1,236 @@
+import argparse
 import datetime
-import os
-import re
-from decimal import Decimal
-from re import sub
-from selenium import webdriver
-from selenium.common.exceptions import NoSuchElementException
-from selenium.common.exceptions import TimeoutException
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.common.action_chains import ActionChains
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.support.ui import WebDriverWait
-from webdriver_manager.chrome import ChromeDriverManager
-from python_utils.functions import cprint, load_json
-from python_utils.logging import setup_logging, get_line_number
-from selenium_utils import Base, JavaScript, Wait
+import json
+import multiprocessing
+from python_utils.functions import cprint
+from python_utils.logging import setup_logging
+from underwrite.address import dedupe_addresses, normalize_address
+from underwrite.batch import read_addresses, underwrite_batch
+from underwrite.client import DaemonClient
+from underwrite.config import load_config
+from underwrite.profiler import Profiler
+from underwrite.store import UnderwritingStore, diff_runs, run_date
+from underwrite.underwriter import Underwriter
+
+def parse_args():
+  parser = argparse.ArgumentParser(description="Underwrite a property for cash or creative.")
+  parser.add_argument("--batch", metavar="FILE", help="CSV or JSONL file of property addresses to underwrite")
+  parser.add_argument("--workers", type=int, help="Number of browser workers used by --batch")
+  parser.add_argument("--skip-stored", action="store_true", help="Reuse the newest stored run of --batch addresses already underwritten instead of scraping them again")
+  parser.add_argument("--output", metavar="FILE", help="Append each batch result to this JSONL file, or write the --calculate table here")
+  parser.add_argument("--calculate", metavar="FILE", help="Run the underwriting math over a CSV, Parquet or JSONL table of properties")
+  parser.add_argument("--serve", action="store_true", help="Keep the browsers signed in and underwrite addresses sent by later runs")
+  parser.add_argument("--stop", action="store_true", help="Stop a running --serve daemon")
+  parser.add_argument("--profile", metavar="FILE", help="Write where the time went to this JSON file, or Prometheus text for a .prom file")
+  parser.add_argument("--history", metavar="ADDRESS", help="List every run of an address and what changed between them")
+  parser.add_argument("--find", action="store_true", help="List stored runs matching --mls, --distressed, --since and --until")
+  parser.add_argument("--mls", help="MLS # to --find, --refresh or --export")
+  parser.add_argument("--distressed", help="Distressed status to --find, --refresh or --export, e.g. Pre-Foreclosure")
+  parser.add_argument("--since", type=datetime.date.fromisoformat, metavar="YYYY-MM-DD", help="Only --find, --refresh or --export runs on or after this date")
+  parser.add_argument("--until", type=datetime.date.fromisoformat, metavar="YYYY-MM-DD", help="Only --find, --refresh or --export runs on or before this date")
+  parser.add_argument("--notes", type=int, metavar="RUN", help="Print the notes of a stored run")
+  parser.add_argument("--export", metavar="FILE", help="Write every stored run matching --mls, --distressed, --since and --until to a Parquet, CSV or JSONL file")
+  parser.add_argument("--refresh", nargs="?", const="", metavar="ADDRESS", help="Scrape only the listing again for a stored address, or for every one matching --mls, --distressed, --since and --until")
+  return parser.parse_args()
+# end of parse_args
+
+def write_profile(profiler, path):
+  if not path:
+    return
+  profiler.write(path)
+  cprint(f"<g>Profile written to \"{path}\"")
+# end of write_profile
+
+def write_result(output, result, duplicates):
+  # Later spellings of the address get a copy of the result
+  if not output:
+    return
+  output.write(json.dumps(result, default=str) + "\n")
+  for property_address in duplicates.get(result["property_address"], []):
+    output.write(json.dumps({**result, "property_address": property_address, "duplicate_of": result["property_address"]}, default=str) + "\n")
+  output.flush()
+# end of write_result
+
+def describe_run(run):
+  listing_info = run["listing_info"]
+  return f"#{run['id']} {run_date(run)} {run['property_address']} ({run['source']}) MLS # {listing_info.get('mls_number')}, {listing_info.get('ask_price')}"
+# end of describe_run
 
 def main():
   setup_logging()
-
-  def initialize_chrome_options():
-    # Initialize special chrome options for selenium to utilize
-    chrome_options = webdriver.ChromeOptions()
-    chrome_options.add_experimental_option("detach", True) # Keep browser open after completion
-    chrome_options.add_argument("--start-maximized")
-    chrome_options.add_argument("--disable-notifications")
-    chrome_options.add_argument("--disable-site-isolation-trials")
-    return chrome_options
-  # end of initialize_chrome_options
-
-  def initialize_chrome_webdriver(chrome_options):
-    return webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=chrome_options)
-  # end of initialize_chrome_webdriver
-
-  config = load_json("config.json")
+  args = parse_args()
+  config = load_config("config.json")
 
   #region Constants
-  CURRENT_DATE = datetime.date.today().strftime('%m/%d/%y')  
   PROPERTY_ADDRESS = config["targets"]["property_address"]
-  PROPSTREAM_EMAIL = config["propstream"]["email"]
-  PROPSTREAM_PASSWORD = config["propstream"]["password"]
-  PROPSTREAM_ZOOM = config["propstream"]["zoom"]
-  COMPASS_EMAIL = config["compass"]["email"]
-  COMPASS_PASSWORD = config["compass"]["password"]
-  RENO_T1 = config["renovation"]["tier_1"]
-  RENO_T1_5 = config["renovation"]["tier_1.5"]
-  RENO_T2 = config["renovation"]["tier_2"]
-  RENO_T2_5 = config["renovation"]["tier_2.5"]
-  RENO_T3 = config["renovation"]["tier_3"]
-  RENO_T3_5 = config["renovation"]["tier_3.5"]
-  RENO_T1925 = config["renovation"]["tier_1925"]
-  TIMEOUT_DEFAULT = config["timeouts"]["default"]
-  TIMEOUT_LOGIN = config["timeouts"]["login"]
-  TIMEOUT_SEARCH = config["timeouts"]["search"]
-  URL_REDFIN = "https://www.redfin.com/"
+  BATCH_WORKERS = config["batch"]["workers"]
+  BROWSER_PROFILE = config["browser"]["profile"]
+  STORE_PATH = config["store"]["path"]
   #endregion Constants
 
-  cprint(f"<g>Underwriting {PROPERTY_ADDRESS}...")
-
-  base = Base()
-  driver = base.initialize_driver()
-  actions = ActionChains(driver)
-  wait = Wait(driver, TIMEOUT_DEFAULT)
-  js = JavaScript(driver)
-
-  def switch_to_recently_opened_tab():
-    driver.switch_to.window(driver.window_handles[len(driver.window_handles) - 1])
-  # end of switch_to_recently_opened_tab
-
-  def sign_into_propstream(email, password):
-    # Autofill email and password fields.
-    wait.until_clickable((By.CSS_SELECTOR, "input[name='username']"))
-    if (email):
-      input_email_css = "input[name='username']"
-      input_email = driver.find_element(By.CSS_SELECTOR, input_email_css)
-      input_email.send_keys(email)
-    if (password):
-      input_password_css = "input[name='password']"
-      input_password = driver.find_element(By.CSS_SELECTOR, input_password_css)
-      input_password.send_keys(password)
-      submit_css = "button[type='submit']"
-      submit = driver.find_element(By.CSS_SELECTOR, submit_css)
-      submit.click()
-    # Wait until property address field after login is clickable
-    input_css = "input[placeholder='Enter County, City, Zip Code(s) or APN #']"
-    wait.for_element_located((By.CSS_SELECTOR, input_css), TIMEOUT_LOGIN)
-  # end of sign_into_propstream
+  profiler = Profiler(enabled=bool(args.profile))
 
-  def get_info_from_propstream(property_address):
-    # Once in PropStream, look up property address and grab all important information
-    # Search address
-    input_placeholder = "Enter County, City, Zip Code(s) or APN #"
-    input_xpath = f"//input[@placeholder='{input_placeholder}']"
-    input = wait.until_clickable((By.XPATH, input_xpath))
-    input.send_keys(property_address)
-    
+  # pandas, numpy and pyarrow are only imported by the modes that need them,
+  # so handing an address to a running daemon starts quickly
+  if args.serve:
+    from underwrite.daemon import UnderwriteDaemon
     try:
-      # Click Details button
-      details_xpath = "//span[text()='Details']"
-      details = wait.for_element_located((By.XPATH, details_xpath), TIMEOUT_SEARCH)
-      actions.move_to_element(details).perform()
-      details.click()
-    except TimeoutException:
-      pass
-
-    # Grab owner and mortgage info
-    owner_xpath = "//div[text()='Owner 1 Name']/following-sibling::div"
-    owner = wait.for_element_located((By.XPATH, owner_xpath), TIMEOUT_SEARCH)
-    owner = owner.text
-    mortgage_xpath = "//div[text()='Est. Mortgage Balance']/preceding-sibling::div"
-    mortgage = driver.find_element(By.XPATH, mortgage_xpath).text
-    comps_tab_xpath = "//div[text()='Comparables & Nearby Listings']"
-    comps_tab = driver.find_element(By.XPATH, comps_tab_xpath)
-    comps_tab.click()
-
-    # Grab Distressed Condition
-    # We don't want to waste our time with bank-owned properties.
-    distressed_xpath = "//div[contains(text(),'Distressed')]/following-sibling::div"
-    distressed = driver.find_element(By.XPATH, distressed_xpath).text
-
-    # Grab Distressed Condition
-    # We don't want to waste our time with bank-owned properties.
-    owner_status_xpath = "//div[contains(text(),'Owner Status')]/following-sibling::div"
-    owner_status = driver.find_element(By.XPATH, owner_status_xpath).text
-
-    # Filter by year built
-    year_built_xpath = "//div[contains(text(),'Year Built')]/following-sibling::div"
-    year_built = wait.for_element_located((By.XPATH, year_built_xpath))
-    actions.move_to_element(year_built).perform()
-    if (year_built.text):
-      year_built = int(year_built.text)
-      input_min_xpath = "//input[@name='yearBuiltMin']"
-      input_min = driver.find_element(By.XPATH, input_min_xpath)
-      input_min.send_keys(year_built - 10)
-      input_max_xpath = "//input[@name='yearBuiltMax']"
-      input_max = driver.find_element(By.XPATH, input_max_xpath)
-      input_max.send_keys(year_built + 10)
-
-    # Grab square footage
-    sqft_xpath = "//div[contains(text(),'SqFt')]/following-sibling::div"
-    square_footage = driver.find_element(By.XPATH, sqft_xpath)
-    if (square_footage.text):
-      square_footage = int(square_footage.text.replace(",", ""))
-
-    # Grab year built
-    year_built = driver.find_element(By.XPATH, "//div[contains(text(),'Year Built')]/following-sibling::div")
-    if (year_built.text):
-      year_built = int(year_built.text.replace(",", ""))
-    else:
-      year_built = ""
-
-    # Filter by public record
-    public_record = driver.find_element(By.XPATH, "//span[text()='Public Record']/preceding-sibling::input")
-    driver.execute_script("arguments[0].click()", public_record)
-
-    # Setting Sale Date Min doesn't work because date picker is finicky
-    #sale_date_min = driver.find_element(By.CSS_SELECTOR, "input[name='saleDateMin']")
-    #three_months_ago = (datetime.today() - relativedelta(months=3)).replace(day=1).strftime("%m/%d/%Y")
-    #sale_date_min.clear()
-    #sale_date_min.send_keys(three_months_ago)
-    
-    # Grab all comps and take the average
-    # #e4f3e6 is the light green that indicates public record
-    avg_sale_price_xpath = "//div[contains(text(), 'Avg. Sale Price:')]"
+      UnderwriteDaemon(config, profiler).serve()
+    finally:
+      write_profile(profiler, args.profile)
+    return
+
+  if args.stop:
+    DaemonClient(config).shutdown()
+    cprint("<g>Daemon stopped")
+    return
+
+  if args.history or args.find or args.notes:
+    from underwrite.notes import render_run_notes
+    store = UnderwritingStore(STORE_PATH)
     try:
-      avg_sale_price = driver.find_element(By.XPATH, avg_sale_price_xpath).text
-      price_regex = r"(\$[\d,]*)"
-      price_match = re.search(price_regex, avg_sale_price)
-      avg_sale_price = Decimal(sub(r"[^\d.]", "", price_match.group(1)))
-    except:
-      avg_sale_price = "N/A"
-
-    return {
-      "owner": owner,
-      "mortgage": mortgage,
-      "square_footage": square_footage,
-      "distressed": distressed,
-      "owner_status": owner_status,
-      "year_built": year_built,
-      "average_sale_price": avg_sale_price
-    }
-  # end of get_info_from_propstream
-
-  def sign_into_compass(email, password):
-    log_in = wait.for_element_located((By.CSS_SELECTOR, "button[data-label='Log In']"), TIMEOUT_SEARCH)
-    log_in.click()
-    driver.implicitly_wait(TIMEOUT_DEFAULT)
-    driver.find_element(By.CSS_SELECTOR, ".uc-authentication button:nth-child(5)").click()
-    if email:
-      driver.find_element(By.CSS_SELECTOR, "input[name='email']").send_keys(email)
-      driver.find_element(By.ID, "continue").click()
-      if password:
-        driver.find_element(By.CSS_SELECTOR, "input[name='password']").send_keys(password)
-        driver.find_element(By.ID, "continue").click()
-    
-    # Wait for user to log into compass.com
-    # Wait for "Forgot Password" button to disappear
-    forgot_password = driver.find_element(By.CSS_SELECTOR, ".uc-authentication-footer button")
-    WebDriverWait(driver, TIMEOUT_LOGIN).until(EC.staleness_of(forgot_password))
-  # end of sign_into_compass
-
-  def get_info_from_compass(property_address):
-    search = wait.until_clickable((By.CSS_SELECTOR, "input[aria-describedBy='location-lookup-input-description']"))
-    search.click()
-    search.send_keys(property_address)
+      if args.history:
+        previous = None
+        for run in store.history(args.history):
+          cprint(f"<g>{describe_run(run)}")
+          if previous:
+            for field, (before, after) in diff_runs(previous, run).items():
+              cprint(f"<y>  {field}: {before} -> {after}")
+          previous = run
+      elif args.find:
+        for run in store.find(mls_number=args.mls, distressed=args.distressed, since=args.since, until=args.until):
+          cprint(f"<g>{describe_run(run)}")
+      else:
+        run = store.run(args.notes)
+        if run:
+          print(render_run_notes(run, config))
+        else:
+          cprint(f"<r>No run #{args.notes}")
+    finally:
+      store.close()
+    return
+
+  if args.export:
+    from underwrite.export import export_runs
+    store = UnderwritingStore(STORE_PATH)
     try:
-      mls_number = wait.for_element_located((By.XPATH, "//th[text()='MLS #']/following-sibling::td")).text
-    except TimeoutException:
-      return 1
+      count = export_runs(store, args.export, config, mls_number=args.mls, distressed=args.distressed, since=args.since, until=args.until)
+    finally:
+      store.close()
+    cprint(f"<g>Exported {count} runs to \"{args.export}\"")
+    return
+
+  if args.refresh is not None:
+    from underwrite.notes import record_refresh
+    store = UnderwritingStore(STORE_PATH)
     try:
-      try:
-        remarks = driver.find_element(By.XPATH, "//div[contains(@class, 'textIntent-body')]/div/span[2]").get_attribute("textContent")
-      except Exception as e:
-        cprint(f"<r>{e}\n<y>Line {get_line_number()}")
-        remarks = driver.find_element(By.XPATH, "//div[contains(@class, 'textIntent-body')]/div/span").text
-    except Exception as e:
-      cprint(f"<r>{e}\n<y>Line {get_line_number()}")
-      remarks = "Didn't find on Compass"
-
-    # Get Listing Agent Info
+      # The newest run of each matching address is the one refreshed
+      previous = {}
+      for run in store.find(args.refresh, args.mls, args.distressed, args.since, args.until):
+        previous.setdefault(normalize_address(run["property_address"]), run)
+      if not previous:
+        cprint("<r>No stored runs to refresh")
+        return
+      workers = args.workers or BATCH_WORKERS
+      cprint(f"<g>Refreshing {len(previous)} listings with {workers} workers...")
+      for result in underwrite_batch(config, [run["property_address"] for run in previous.values()], workers, profiler if args.profile else None, refresh=True):
+        property_address = result["property_address"]
+        if "error" in result:
+          cprint(f"<r>{property_address}: {result['error']}")
+          continue
+        with profiler.stage("record_refresh"):
+          run, _ = record_refresh(store, previous[normalize_address(property_address)], result["listing_info"], config)
+        cprint(f"<g>Notes updated in \"{run['notes_file']}\"")
+    finally:
+      store.close()
+    write_profile(profiler, args.profile)
+    return
+
+  if args.calculate:
+    if not args.output:
+      cprint("<r>--calculate needs --output")
+      return
+    from underwrite.calculator import read_table, underwrite_frame, write_table
+    frame = underwrite_frame(read_table(args.calculate), config)
+    write_table(frame, args.output)
+    cprint(f"<g>Underwrote {len(frame)} properties into \"{args.output}\"")
+    return
+
+  if args.batch:
+    from underwrite.notes import record_run
+    # Spellings of the same property are only scraped once, before any
+    # browser starts, and share the result
+    addresses, duplicates = dedupe_addresses(read_addresses(args.batch))
+    if duplicates:
+      cprint(f"<y>Skipping {sum(len(others) for others in duplicates.values())} duplicate addresses")
+    workers = args.workers or BATCH_WORKERS
+    output = open(args.output, "a", encoding="utf-8") if args.output else None
+    store = UnderwritingStore(STORE_PATH)
     try:
-      listing_agent_xpath = "//div[contains(@class, 'contact-agent')]/p[1]"
-      listing_agent = driver.find_element(By.XPATH, listing_agent_xpath).text
-
-      listing_brokerage_xpath = "//div[contains(@class, 'contact-agent')]/p[2]"
-      listing_brokerage = driver.find_element(By.XPATH, listing_brokerage_xpath).text
-
-      listing_agent_dre_xpath = "//div[contains(@class, 'contact-agent')]/p[contains(text(), 'DRE #')]"
-      listing_agent_dre = driver.find_element(By.XPATH, listing_agent_dre_xpath).text
-
-      listed_by = f"{listing_brokerage}, {listing_agent}, {listing_agent_dre}"
-
-      listing_agent_phone_xpath = "//div[contains(@class, 'contact-agent')]/div/p[contains(text(), 'P:')]"
-      listing_agent_phone = driver.find_element(By.XPATH, listing_agent_phone_xpath).text
-      phone_regex = r".*(\d{3})\.(\d{3})\.(\d{4})"
-      listing_agent_phone = re.sub(phone_regex, r"(\1) \2-\3", listing_agent_phone)
-
-      listing_agent_email_xpath = "//div[contains(@class, 'contact-agent')]/a[contains(@href, 'mailto')]"
-      listing_agent_email = driver.find_element(By.XPATH, listing_agent_email_xpath).text
-    except:
-      try:
-        courtesy_xpath = "//span[@data-tn='courtesy-of-text']"
-        courtesy = driver.find_element(By.XPATH, courtesy_xpath).text
-        listed_by = sub("Listing Courtesy of ", "", courtesy)
-      except:
-        listed_by = "Didn't find on Compass"
+      if args.skip_stored:
+        remaining = []
+        for property_address in addresses:
+          run = store.latest(property_address)
+          if run is None:
+            remaining.append(property_address)
+            continue
+          cprint(f"<y>{property_address} was already underwritten as run #{run['id']}, notes in \"{run['notes_file']}\"")
+          write_result(output, {"property_address": property_address, "propstream_info": run["propstream_info"], "listing_info": run["listing_info"], "run_id": run["id"], "underwritten_at": run["underwritten_at"]}, duplicates)
+        addresses = remaining
+      cprint(f"<g>Underwriting {len(addresses)} properties with {workers} workers...")
+      for result in underwrite_batch(config, addresses, workers, profiler if args.profile else None):
+        property_address = result["property_address"]
+        if "error" in result:
+          cprint(f"<r>{property_address}: {result['error']}")
+        else:
+          with profiler.stage("record_run"):
+            run, _ = record_run(store, result, "batch", config)
+          cprint(f"<g>Notes written to \"{run['notes_file']}\"")
+        write_result(output, result, duplicates)
+    finally:
+      store.close()
+      if output:
+        output.close()
+    write_profile(profiler, args.profile)
+    return
 
-      listing_agent_phone = "Didn't find on Compass"
-      listing_agent_email = "Didn't find on Compass"
-    
-    # Get Ask Price
-    try:
-      ask_price = driver.find_element(By.XPATH, "//div[text()='Price']//preceding-sibling::div").text
-    except Exception as e:
-      cprint(f"<r>{e}\n<y>Line {get_line_number()}")
-      ask_price = "Didn't find on Compass"
-    try:
-      days_on_market = "Days on Compass: " + driver.find_element(By.XPATH, "//th[text()='Days on Compass']/following-sibling::td").text
-    except NoSuchElementException:
-      days_on_market = "Days on Compass: N/A"
-    try:
-      pool = driver.find_element(By.XPATH, "//div[contains(text(), 'Pool')]/span").text
-    except NoSuchElementException:
-      pool = "Didn't find on Compass"
-    return {
-      "mls_number": mls_number,
-      "remarks": remarks,
-      "listed_by": listed_by,
-      "listing_agent_phone": listing_agent_phone,
-      "listing_agent_email": listing_agent_email,
-      "ask_price": ask_price,
-      "days_on_market": days_on_market,
-      "pool": pool,
-      "pictures": driver.current_url
-    }
-  # end of get_info_from_compass
-
-  def get_info_from_redfin(property_address):
-    driver.get("https://www.google.com/")
-    search = driver.find_element(By.CSS_SELECTOR, "input[title='Search']")
-    search.send_keys(f"redfin {property_address}")
-    driver.find_element(By.CSS_SELECTOR, "input[value='Google Search']").submit()
-    try:
-      redfin_link = driver.find_element(By.CSS_SELECTOR, f"a[href*='{URL_REDFIN}']")
-      redfin_link.click()
-    except Exception as e:
-      cprint(f"<r>{e}\n<y>Line {get_line_number()}")
-      return 1
-    try:
-      mls_number = wait.for_element_located((By.XPATH, "//div[contains(@class, 'sourceContent')]/span[2]")).text
-    except Exception as e:
-      cprint(f"<r>{e}\n<y>Line {get_line_number()}")
-      return 1
-    try:
-      remarks = driver.find_element(By.XPATH, "//div[contains(@class, 'remarks')]/p/span").text
-    except Exception as e:
-      cprint(f"<r>{e}\n<y>Line {get_line_number()}")
-      remarks = "Couldn't locate on Redfin"
-    
-    # Get Listing Agent Info
-    try:
-      listing_agent_xpath = "//span[contains(text(), 'Listed by')]/span[1]"
-      listing_agent = driver.find_element(By.XPATH, listing_agent_xpath).text
-      listing_brokerage_xpath = "//span[contains(text(), 'Listed by')]/span[3]"
-      listing_brokerage = driver.find_element(By.XPATH, listing_brokerage_xpath).text
-      listing_agent_dre_xpath = "//span[contains(text(), 'Listed by')]/span[2]"
-      listing_agent_dre = driver.find_element(By.XPATH, listing_agent_dre_xpath).text
-      listed_by = f"{listing_brokerage}, {listing_agent}, {listing_agent_dre}"
-    except:
-      listed_by = "Didn't find on Redfin"
-
-    # Get Ask Price
-    try:
-      ask_price = driver.find_element(By.XPATH, "//div[contains(@class, 'statsValue')]").text
-    except Exception as e:
-      cprint(f"<r>{e}\n<y>Line {get_line_number()}")
-      ask_price = "Didn't find on Redfin"
-    
-    # Get Time on Redfin
-    try:
-      days_on_market_xpath = "//span[contains(text(), 'Time on Redfin')]/ancestor::span[contains(@class,'header')]/following-sibling::span"
-      days_on_market = "Time on Redfin: " + driver.find_element(By.XPATH, days_on_market_xpath).text
-    except Exception as e:
-      cprint(f"<r>{e}\n<y>Line {get_line_number()}")
-      days_on_market = "Time on Redfin: Could not find Time on Redfin"
-    pictures = driver.current_url
-    return {
-      "mls_number": mls_number,
-      "remarks": remarks,
-      "listed_by": listed_by,
-      "listing_agent_phone": "Redfin doesn't show this info",
-      "listing_agent_email": "Redfin doesn't show this info",
-      "ask_price": ask_price,
-      "days_on_market": days_on_market,
-      "pool": "Redfin doesn't list pool status",
-      "pictures": pictures
-    }
-  # end of get_info_from_redfin
-
-  driver.get("https://login.propstream.com/")
-  sign_into_propstream(PROPSTREAM_EMAIL, PROPSTREAM_PASSWORD)
-  propstream_info = get_info_from_propstream(PROPERTY_ADDRESS)
-  if (PROPSTREAM_ZOOM):
-    driver.execute_script(f"document.body.style.zoom='{PROPSTREAM_ZOOM}%'")
-
-  driver.execute_script("window.open('https://www.compass.com/');")
-  switch_to_recently_opened_tab()
-  sign_into_compass(COMPASS_EMAIL, COMPASS_PASSWORD)
-  listing_info = get_info_from_compass(PROPERTY_ADDRESS)
-  if listing_info == 1:
-    listing_info = get_info_from_redfin(PROPERTY_ADDRESS)
-  if listing_info == 1:
-    listing_info = {
-      "mls_number": "Couldn't find on Compass or Redfin",
-      "remarks": "Couldn't find on Compass or Redfin",
-      "listed_by": "Couldn't find on Compass or Redfin",
-      "listing_agent_phone": "Couldn't find on Compass or Redfin",
-      "listing_agent_email": "Couldn't find on Compass or Redfin",
-      "ask_price": "Couldn't find on Compass or Redfin",
-      "days_on_market": "DOM: Couldn't find on Compass or Redfin",
-      "pool": "Couldn't find on Compass or Redfin",
-      "pictures": "Couldn't find on Compass or Redfin"
-    }
-
-  notes = "# BASIC INFO\n"
-  notes += f"Address: {PROPERTY_ADDRESS}\n"
-  notes += f"MLS #: {listing_info['mls_number']}\n"
-  notes += f"{listing_info['days_on_market']} as of {CURRENT_DATE}\n"
-  notes += f"Listed by: {listing_info['listed_by']}\n"
-  notes += f"Agent's Phone: {listing_info['listing_agent_phone']}\n"
-  notes += f"Agent's Email: {listing_info['listing_agent_email']}\n"
-  notes += f"Owner: {propstream_info['owner']}\n"
-  notes += f"Owner Status: {propstream_info['owner_status']}\n"
-  notes += f"Distressed: {propstream_info['distressed']}\n"
-  notes += f"Year Built: {propstream_info['year_built']}\n"
-  notes += f"Pool: {listing_info['pool']}\n"
-  notes += f"Pictures: {listing_info['pictures']}\n"
-  notes += f"Listing Remarks: {listing_info['remarks']}\n"
-  notes += "\n"
-
-  notes += "## OTHER IMPORTANT INFORMATION\n"
-  notes += "-Sample 1\n"
-  notes += "\n"
-
-  if propstream_info['average_sale_price'] != "N/A":
-    avg_sale_price = "${:,.2f}".format(propstream_info['average_sale_price'])
-    avg_sale_price_multiply = "${:,.2f}".format(propstream_info['average_sale_price'] * Decimal('0.6'))
-    notes += "## QUICK TEMP CHECK\n"
-    notes += f"Average Market Sale Price: {avg_sale_price}\n"
-    notes += f"Price * 60%: {avg_sale_price_multiply}\n"
-    notes += "\n"
-
-  notes += "# UNDERWRITING\n"
-  notes += f"## ORIGINAL {CURRENT_DATE}\n"
-  notes += f"Asking Price {listing_info['ask_price']}\n"
-  notes += "ARV \n"
-  notes += "Repairs \n"
-  notes += "Your Fee $15,000\n"
-  notes += "Credit to your buyer $0\n"
-  notes += "Wholesale Discount 80%\n"
-  notes += "MAO Wholesale \n"
-  notes += "% of ARV \n"
-  notes += "Amount under asking \n"
-  notes += f"Est. Mortgage {propstream_info['mortgage']}\n"
-  notes += "Seller Profit Est \n"
-  notes += "\n"
-
-  notes += "# COMPARABLES\n"
-  notes += "Comp:\n"
-  notes += "Address: \n"
-  notes += "Date Sold: \n"
-  notes += "Sold Price: \n"
-  notes += "Pool: \n"
-  notes += "Pictures: \n"
-  notes += "\n"
-
-  notes += "# ARV CALCULATIONS\n"
-  notes += "Comp Sold Price: \n"
-  notes += "Comp $ / sqft: \n"
-  notes += "Subj Adj ARV: \n"
-  notes += "Market Adjustment (-10%): \n"
-  notes += "Comp has extra bed: -$10k\n"
-  notes += "Comp has extra bath: -$10k\n"
-  notes += "Subj has extra bed: +$10k\n"
-  notes += "Subj has extra bath: +$10k\n"
-  notes += "Final ARV Estimate (rounded down): \n"
-  notes += "\n"
-
-  tier_1 = '${:,}'.format(propstream_info['square_footage'] * RENO_T1)
-  tier_1_5 = '${:,}'.format(propstream_info['square_footage'] * RENO_T1_5)
-  tier_2 = '${:,}'.format(propstream_info['square_footage'] * RENO_T2)
-  tier_2_5 = '${:,}'.format(propstream_info['square_footage'] * RENO_T2_5)
-  tier_3 = '${:,}'.format(propstream_info['square_footage'] * RENO_T3)
-  tier_3_5 = '${:,}'.format(propstream_info['square_footage'] * RENO_T3_5)
-  tier_1925 = '${:,}'.format(propstream_info['square_footage'] * RENO_T1925)
-
-  notes += "# REHAB ESTIMATE\n"
-  notes += f"Tier 1 (${RENO_T1}/sf): {tier_1} on {'{:,}'.format(propstream_info['square_footage'])}sf\n"
-  notes += f"Tier 1.5 (${RENO_T1_5}/sf): {tier_1_5} on {'{:,}'.format(propstream_info['square_footage'])}sf\n"
-  notes += f"Tier 2 (${RENO_T2}/sf): {tier_2} on {'{:,}'.format(propstream_info['square_footage'])}sf\n"
-  notes += f"Tier 2.5 (${RENO_T2_5}/sf): {tier_2_5} on {'{:,}'.format(propstream_info['square_footage'])}sf\n"
-  notes += f"Tier 3 (${RENO_T3}/sf): {tier_3} on {'{:,}'.format(propstream_info['square_footage'])}sf\n"
-  notes += f"Tier 3.5 (${RENO_T3_5}/sf): {tier_3_5} on {'{:,}'.format(propstream_info['square_footage'])}sf\n"
-
-  year_built = propstream_info['year_built']
-  if year_built == "" or year_built <= 1925:
-    notes += f"Year Built <= 1925 (${RENO_T1925}/sf): {tier_1925} on {'{:,}'.format(propstream_info['square_footage'])}sf\n"
-  
-  notes += "Final Rehab Estimate (rounded up): \n"
+  cprint(f"<g>Underwriting {PROPERTY_ADDRESS}...")
 
-  if not os.path.exists(f"underwriting/{PROPERTY_ADDRESS}.md"):
-    with open(f"../underwriting/{PROPERTY_ADDRESS}.md", "w", encoding="utf-8") as f:
-      f.write(notes)
-      js.alert(f"Notes written to \"{PROPERTY_ADDRESS}.md\"")
-  else:
-    i = 1
-    while not os.path.exists(f"underwriting/{PROPERTY_ADDRESS} ({i}).md"):
-      i += 1
-    with open(f"../underwriting/{PROPERTY_ADDRESS} ({i}).md", "w", encoding="utf-8") as f:
-      f.write(notes)
-      js.alert(f"Notes written to \"{PROPERTY_ADDRESS} ({i}).md\"")
+  # A running daemon already has its browsers signed in, so hand it the job
+  client = DaemonClient(config)
+  if client.is_running():
+    with profiler.stage("daemon.underwrite"):
+      response = client.underwrite(PROPERTY_ADDRESS)
+    cprint(f"<g>Notes written to \"{response['notes_file']}\"")
+    write_profile(profiler, args.profile)
+    return
+
+  from underwrite.notes import record_run
+  underwriter = Underwriter(config, profiler)
+  try:
+    result = underwriter.underwrite(PROPERTY_ADDRESS)
+  finally:
+    if BROWSER_PROFILE == "fast":
+      # Headless browsers can't be looked over, and detached ones would
+      # outlive this run
+      underwriter.close()
+    else:
+      # The browsers are left open to look the property over, so close()
+      # isn't called, but how long the waits took is still worth keeping
+      underwriter.latencies.save()
+  store = UnderwritingStore(STORE_PATH)
+  try:
+    with profiler.stage("record_run"):
+      run, _ = record_run(store, result, "single", config)
+  finally:
+    store.close()
+  filename = run["notes_file"]
+  cprint(f"<g>Notes written to \"{filename}\"")
+  write_profile(profiler, args.profile)
+  # Everything may have come from the cache, in which case there's no browser to alert in
+  if underwriter.started and BROWSER_PROFILE != "fast":
+    underwriter.propstream.js.alert(f"Notes written to \"{filename}\"")
 
 if __name__ == "__main__":
-  main()
\ No newline at end of file
+  multiprocessing.freeze_support()
+  main()
@@ -0,0 +1,218 @@
+import re
+
+# Bump whenever normalize_address changes, so stored keys get rebuilt
+ADDRESS_KEY_VERSION = 3
+
+# USPS Publication 28 street suffixes and directionals, spelled out -> standard
+# abbreviation. Common misspellings USPS accepts are folded in too.
+ABBREVIATIONS = {
+  "ALLEY": "ALY", "ALLEE": "ALY", "ALLY": "ALY",
+  "ANNEX": "ANX", "ARCADE": "ARC",
+  "AVENUE": "AVE", "AV": "AVE", "AVEN": "AVE", "AVENU": "AVE", "AVN": "AVE", "AVNUE": "AVE",
+  "BAYOU": "BYU", "BEACH": "BCH", "BEND": "BND", "BLUFF": "BLF",
+  "BOULEVARD": "BLVD", "BOUL": "BLVD", "BOULV": "BLVD",
+  "BRANCH": "BR", "BRIDGE": "BRG", "BROOK": "BRK", "BYPASS": "BYP",
+  "CANYON": "CYN", "CAPE": "CPE", "CAUSEWAY": "CSWY",
+  "CENTER": "CTR", "CENTRE": "CTR", "CENT": "CTR", "CNTR": "CTR",
+  "CIRCLE": "CIR", "CIRC": "CIR", "CIRCL": "CIR", "CRCL": "CIR",
+  "CLIFF": "CLF", "CLUB": "CLB", "COMMON": "CMN", "CORNER": "COR",
+  "COURSE": "CRSE", "COURT": "CT", "COVE": "CV", "CREEK": "CRK", "CRESCENT": "CRES",
+  "CROSSING": "XING", "CROSSROAD": "XRD", "CURVE": "CURV",
+  "DRIVE": "DR", "DRIV": "DR", "DRV": "DR",
+  "ESTATE": "EST", "ESTATES": "ESTS",
+  "EXPRESSWAY": "EXPY", "EXPRESS": "EXPY", "EXTENSION": "EXT",
+  "FALLS": "FLS", "FERRY": "FRY", "FIELD": "FLD", "FIELDS": "FLDS", "FLAT": "FLT",
+  "FOREST": "FRST", "FORK": "FRK", "FORT": "FT", "FREEWAY": "FWY",
+  "GARDEN": "GDN", "GARDENS": "GDNS", "GATEWAY": "GTWY", "GLEN": "GLN", "GREEN": "GRN", "GROVE": "GRV",
+  "HARBOR": "HBR", "HAVEN": "HVN", "HEIGHTS": "HTS", "HIGHWAY": "HWY", "HIGHWY": "HWY", "HIWAY": "HWY",
+  "HILL": "HL", "HILLS": "HLS", "HOLLOW": "HOLW",
+  "ISLAND": "IS", "JUNCTION": "JCT", "KNOLL": "KNL",
+  "LAKE": "LK", "LAKES": "LKS", "LANDING": "LNDG", "LANE": "LN",
+  "MANOR": "MNR", "MEADOW": "MDW", "MEADOWS": "MDWS", "MILL": "ML", "MISSION": "MSN",
+  "MOUNT": "MT", "MOUNTAIN": "MTN", "MOTORWAY": "MTWY",
+  "ORCHARD": "ORCH", "OVERPASS": "OPAS",
+  "PARKWAY": "PKWY", "PARKWY": "PKWY", "PKY": "PKWY",
+  "PASSAGE": "PSGE", "PINE": "PNE", "PINES": "PNES", "PLACE": "PL", "PLAIN": "PLN",
+  "PLAINS": "PLNS", "PLAZA": "PLZ", "POINT": "PT", "POINTE": "PT", "PORT": "PRT",
+  "PRAIRIE": "PR", "RANCH": "RNCH", "RIDGE": "RDG", "RIVER": "RIV", "ROAD": "RD",
+  "ROUTE": "RTE", "SHORE": "SHR", "SHORES": "SHRS", "SKYWAY": "SKWY", "SPRING": "SPG",
+  "SPRINGS": "SPGS", "SQUARE": "SQ", "STATION": "STA", "STREAM": "STRM",
+  "STREET": "ST", "STR": "ST", "STRT": "ST",
+  "SUMMIT": "SMT", "TERRACE": "TER", "TRACE": "TRCE", "TRAIL": "TRL", "TRAILS": "TRL",
+  "TRAFFICWAY": "TRFY", "TUNNEL": "TUNL", "TURNPIKE": "TPKE",
+  "VALLEY": "VLY", "VIADUCT": "VIA", "VIEW": "VW", "VILLAGE": "VLG", "VISTA": "VIS",
+  "WALK": "WALK", "WELLS": "WLS",
+  "NORTH": "N", "SOUTH": "S", "EAST": "E", "WEST": "W",
+  "NORTHEAST": "NE", "NORTHWEST": "NW", "SOUTHEAST": "SE", "SOUTHWEST": "SW"
+}
+
+DIRECTIONALS = {"N", "S", "E", "W", "NE", "NW", "SE", "SW"}
+# The usual street types, as USPS abbreviates them
+STREET_TYPES = {"ST", "AVE", "RD", "DR", "BLVD", "LN", "CT", "WAY", "PL", "CIR", "TER", "PKWY", "HWY", "TRL", "LOOP"}
+# Spelled out or abbreviated, every word that can end a street name
+STREET_SUFFIXES = {word for word, abbreviation in ABBREVIATIONS.items() if abbreviation not in DIRECTIONALS} | {abbreviation for abbreviation in ABBREVIATIONS.values() if abbreviation not in DIRECTIONALS}
+
+# Designators that all mean "this unit of the building". They're folded into
+# "#{unit}" so "Apt 1", "Unit 1" and "#1" are the same property. FL is left
+# out, it's far more often Florida than a floor.
+UNIT_DESIGNATORS = {"#", "APARTMENT", "APT", "UNIT", "SUITE", "STE", "SPACE", "SPC", "ROOM", "RM"}
+
+STATES = {
+  "ALABAMA": "AL", "ALASKA": "AK", "ARIZONA": "AZ", "ARKANSAS": "AR", "CALIFORNIA": "CA", "COLORADO": "CO",
+  "CONNECTICUT": "CT", "DELAWARE": "DE", "DISTRICT OF COLUMBIA": "DC", "FLORIDA": "FL", "GEORGIA": "GA",
+  "HAWAII": "HI", "IDAHO": "ID", "ILLINOIS": "IL", "INDIANA": "IN", "IOWA": "IA", "KANSAS": "KS",
+  "KENTUCKY": "KY", "LOUISIANA": "LA", "MAINE": "ME", "MARYLAND": "MD", "MASSACHUSETTS": "MA",
+  "MICHIGAN": "MI", "MINNESOTA": "MN", "MISSISSIPPI": "MS", "MISSOURI": "MO", "MONTANA": "MT",
+  "NEBRASKA": "NE", "NEVADA": "NV", "NEW HAMPSHIRE": "NH", "NEW JERSEY": "NJ", "NEW MEXICO": "NM",
+  "NEW YORK": "NY", "NORTH CAROLINA": "NC", "NORTH DAKOTA": "ND", "OHIO": "OH", "OKLAHOMA": "OK",
+  "OREGON": "OR", "PENNSYLVANIA": "PA", "RHODE ISLAND": "RI", "SOUTH CAROLINA": "SC", "SOUTH DAKOTA": "SD",
+  "TENNESSEE": "TN", "TEXAS": "TX", "UTAH": "UT", "VERMONT": "VT", "VIRGINIA": "VA", "WASHINGTON": "WA",
+  "WEST VIRGINIA": "WV", "WISCONSIN": "WI", "WYOMING": "WY"
+}
+
+def tokenize(text):
+  return re.findall(r"[^\W_]+|#", text.replace("'", ""))
+# end of tokenize
+
+def is_unit_number(token):
+  return any(character.isdigit() for character in token) or len(token) == 1 and token != "#"
+# end of is_unit_number
+
+def street_end(tokens):
+  # Index just past the street suffix and any directional after it, e.g. 4
+  # in "123 MAIN ST NW SPRINGFIELD". A suffix right after the house number
+  # is the street's name ("8 Court St"). Common street types win over rarer
+  # suffixes ("Lake Shore Dr", "Fort Worth Ave Fort Worth"). Returns None
+  # when there's no suffix to go by.
+  candidates = [i for i in range(2, len(tokens)) if tokens[i] in STREET_SUFFIXES]
+  if not candidates:
+    return None
+  def next_token(i):
+    return ABBREVIATIONS.get(tokens[i + 1], tokens[i + 1]) if i + 1 < len(tokens) else None
+  end = next((i for i in candidates if ABBREVIATIONS.get(tokens[i], tokens[i]) in STREET_TYPES and next_token(i) not in STREET_TYPES), None)
+  if end is None:
+    end = next((i for i in candidates if i + 1 == len(tokens) or tokens[i + 1] not in STREET_SUFFIXES), candidates[-1])
+  end += 1
+  # "NW" is the street's, but a spelled out "North" may start the city
+  if end < len(tokens) and (tokens[end] in DIRECTIONALS or ABBREVIATIONS.get(tokens[end]) in DIRECTIONALS and (end + 1 == len(tokens) or tokens[end + 1] in UNIT_DESIGNATORS)):
+    end += 1
+  return end
+# end of street_end
+
+def unit_end(tokens, i):
+  # Index just past the unit when tokens[i] starts one, e.g. "APT # 4", or None
+  if tokens[i] not in UNIT_DESIGNATORS or i + 1 >= len(tokens):
+    return None
+  # "Apt #1" has two designators in a row
+  unit = i + 2 if tokens[i + 1] == "#" and i + 2 < len(tokens) else i + 1
+  return unit + 1 if is_unit_number(tokens[unit]) else None
+# end of unit_end
+
+def normalize_street(tokens):
+  # USPS abbreviations, and designators followed by a unit number after the
+  # street folded into "#{unit}", so "8 Ste Marie Rd" keeps its street name.
+  # A street without a suffix can't tell, so any past its first word folds.
+  end = street_end(tokens)
+  end = 2 if end is None else end
+  words = []
+  i = 0
+  while i < len(tokens):
+    unit = unit_end(tokens, i) if i >= end or tokens[i] == "#" else None
+    if unit:
+      words.append(f"#{tokens[unit - 1]}")
+      i = unit
+      continue
+    words.append(ABBREVIATIONS.get(tokens[i], tokens[i]) if i < end else tokens[i])
+    i += 1
+  return " ".join(words)
+# end of normalize_street
+
+def split_locality(tokens):
+  # (city, state, ZIP) from the tokens after the street, any of them "" when missing
+  zip_code = tokens.pop() if tokens and re.fullmatch(r"\d{5}", tokens[-1]) else ""
+  state = ""
+  for length in (3, 2, 1):
+    name = " ".join(tokens[-length:])
+    if len(tokens) >= length and (name in STATES or length == 1 and name in STATES.values()):
+      state = STATES.get(name, name)
+      del tokens[-length:]
+      break
+  return " ".join(tokens), state, zip_code
+# end of split_locality
+
+def address_parts(property_address):
+  # (street, city, state, ZIP), normalized. The street keeps its unit. With
+  # commas, the street is the first part, plus any part that's only a unit.
+  # Without them, it ends at the street suffix and the unit after it.
+  address = property_address.upper()
+  address = re.sub(r"\b(\d{5})-?\d{4}\b", r"\1", address)
+  address = re.sub(r"[,\s]+(USA|US|UNITED STATES( OF AMERICA)?)\.?\s*$", "", address)
+  segments = [tokenize(segment) for segment in address.split(",")]
+  segments = [segment for segment in segments if segment]
+  if not segments:
+    return "", "", "", ""
+  if len(segments) > 1:
+    street = segments[0]
+    locality = []
+    for segment in segments[1:]:
+      if not locality and segment[0] in UNIT_DESIGNATORS:
+        street = street + segment
+      else:
+        locality += segment
+  else:
+    tokens = segments[0]
+    end = street_end(tokens)
+    if end is None:
+      # Without a suffix, a unit is the only sign of where the street ends
+      end = next((unit_end(tokens, i) for i in range(2, len(tokens)) if unit_end(tokens, i)), len(tokens))
+    # Keep the unit with the street
+    while end < len(tokens) and unit_end(tokens, end):
+      end = unit_end(tokens, end)
+    street, locality = tokens[:end], tokens[end:]
+  if not locality:
+    # The state and ZIP may still trail a street without a suffix
+    street = list(street)
+    _, state, zip_code = split_locality(street)
+    return normalize_street(street), "", state, zip_code
+  city, state, zip_code = split_locality(list(locality))
+  return normalize_street(street), city, state, zip_code
+# end of address_parts
+
+def normalize_city(city):
+  return " ".join(tokenize(city.upper()))
+# end of normalize_city
+
+def normalize_address(property_address):
+  # Key used to recognize the same property across runs and lead lists no
+  # matter how the address was typed: casing, punctuation, USPS suffixes and
+  # directionals, unit designators, ZIP+4 and a trailing country all fold
+  # away, e.g. "123 Main Street, Apt. 1, Springfield, IL 62704-1234, USA"
+  # and "123 MAIN ST #1 Springfield IL" share a key. It's the street and the
+  # city, so lists that leave off the state or ZIP still match.
+  street, city, _, _ = address_parts(property_address)
+  return f"{street} {city}".strip()
+# end of normalize_address
+
+def dedupe_addresses(addresses):
+  # Returns (unique, duplicates): the first spelling of every property in
+  # input order, and {first spelling: [later spellings]} for those that
+  # showed up more than once. An address with no city matches one that has
+  # it when that's the only city the street shows up with.
+  parts = {property_address: address_parts(property_address) for property_address in addresses}
+  cities = {}
+  for street, city, _, _ in parts.values():
+    if city:
+      cities.setdefault(street, set()).add(city)
+  first = {}
+  duplicates = {}
+  for property_address in addresses:
+    street, city, _, _ = parts[property_address]
+    if not city and len(cities.get(street, ())) == 1:
+      city = next(iter(cities[street]))
+    key = (street, city)
+    if key in first:
+      duplicates.setdefault(first[key], []).append(property_address)
+    else:
+      first[key] = property_address
+  return list(first.values()), duplicates
+# end of dedupe_addresses
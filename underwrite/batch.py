@@ -0,0 +1,145 @@
+import csv
+import json
+import multiprocessing
+import time
+from collections import Counter
+from queue import Empty
+from python_utils.logging import setup_logging
+from .profiler import Profiler
+from .scheduler import Scheduler
+from .underwriter import Underwriter, browser_failed
+
+ADDRESS_COLUMNS = ("property_address", "address")
+
+# Seconds between checks that the workers are still alive while waiting on them
+POLL_SECONDS = 1
+
+def read_addresses(path):
+  # Addresses can come from a CSV (a "property_address"/"address" column, or
+  # the first column when there is no header) or from JSONL (one object with
+  # one of those keys, or one bare string, per line).
+  addresses = []
+  if path.lower().endswith((".jsonl", ".ndjson")):
+    with open(path, "r", encoding="utf-8") as f:
+      for line in f:
+        line = line.strip()
+        if not line:
+          continue
+        row = json.loads(line)
+        if isinstance(row, dict):
+          row = next((row[key] for key in ADDRESS_COLUMNS if row.get(key)), "")
+        addresses.append(str(row).strip())
+  else:
+    with open(path, "r", encoding="utf-8", newline="") as f:
+      rows = list(csv.reader(f))
+    column = 0
+    if rows:
+      header = [cell.strip().lower() for cell in rows[0]]
+      for key in ADDRESS_COLUMNS:
+        if key in header:
+          column = header.index(key)
+          rows = rows[1:]
+          break
+    for row in rows:
+      if len(row) > column:
+        addresses.append(row[column].strip())
+  return [address for address in addresses if address]
+# end of read_addresses
+
+def worker(config, tasks, results, profiles, refresh, scheduler):
+  # Each worker keeps one logged-in Underwriter for its whole lifetime and
+  # pulls addresses until it receives the None sentinel. The browsers start
+  # with the first address that isn't fully cached. When profiling, the
+  # worker's report is sent back on profiles once it's done. With refresh,
+  # only listings are scraped and PropStream is never opened. Every worker
+  # shares scheduler, so the sites' rate limits hold across all of them.
+  setup_logging()
+  profiler = Profiler() if profiles else None
+  underwriter = None
+  try:
+    underwriter = Underwriter(config, profiler, listing_only=refresh, scheduler=scheduler)
+    while True:
+      property_address = tasks.get()
+      if property_address is None:
+        break
+      start = time.perf_counter()
+      try:
+        result = underwriter.refresh_listing(property_address) if refresh else underwriter.underwrite(property_address)
+      except Exception as e:
+        result = {"property_address": property_address, "error": f"{e}"}
+        # The next address starts the browsers over if they're what failed
+        if browser_failed(e):
+          underwriter.quit()
+      # Includes starting the browsers for the worker's first scraped address
+      result["elapsed_seconds"] = time.perf_counter() - start
+      # --calculate ages the comps from this
+      result["underwritten_at"] = time.time()
+      results.put(result)
+  finally:
+    try:
+      if underwriter:
+        underwriter.close()
+    finally:
+      if profiler:
+        profiles.put(profiler.report())
+# end of worker
+
+def get(queue, processes):
+  # The next item on queue, or None once every worker has exited and
+  # nothing is left on it
+  while True:
+    try:
+      return queue.get(timeout=POLL_SECONDS)
+    except Empty:
+      if not any(process.is_alive() for process in processes):
+        # A worker may have put its last item just before exiting
+        try:
+          return queue.get(timeout=POLL_SECONDS)
+        except Empty:
+          return None
+# end of get
+
+def underwrite_batch(config, addresses, workers, profiler=None, refresh=False):
+  # Yields one result per address as soon as any worker finishes it.
+  # Results come back in completion order, not input order. Every worker's
+  # profile is merged into profiler once the last result is in.
+  # With refresh, results only have a freshly scraped listing_info. Addresses
+  # a worker died holding come back as errors once every worker has exited.
+  workers = max(1, min(workers, len(addresses)))
+  tasks = multiprocessing.Queue()
+  results = multiprocessing.Queue()
+  profiles = multiprocessing.Queue() if profiler else None
+  scheduler = Scheduler(config)
+  for property_address in addresses:
+    tasks.put(property_address)
+  for _ in range(workers):
+    tasks.put(None)
+
+  processes = [
+    multiprocessing.Process(target=worker, args=(config, tasks, results, profiles, refresh, scheduler), daemon=True)
+    for _ in range(workers)
+  ]
+  for process in processes:
+    process.start()
+  pending = Counter(addresses)
+  try:
+    while pending:
+      result = get(results, processes)
+      if result is None:
+        break
+      pending[result["property_address"]] -= 1
+      if pending[result["property_address"]] <= 0:
+        del pending[result["property_address"]]
+      yield result
+    for property_address in pending.elements():
+      yield {"property_address": property_address, "error": "The worker underwriting it exited unexpectedly", "elapsed_seconds": None}
+    if profiler:
+      for _ in processes:
+        report = get(profiles, processes)
+        if report is None:
+          break
+        profiler.merge(report)
+  finally:
+    for process in processes:
+      process.join()
+# end of underwrite_batch
@@ -0,0 +1,29 @@
+from selenium_utils import Base
+
+# Always blocked by the fast profile. Nothing we scrape is a font.
+FONT_URLS = ["*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot"]
+
+def initialize_driver(config):
+  # "default" is the visible, maximized browser from selenium_utils.
+  # "fast" runs headless, stops waiting once the DOM is ready, and skips
+  # images, fonts and anything on browser->blocked_urls.
+  base = Base()
+  if config["browser"]["profile"] == "fast":
+    options = base.options
+    options.add_argument("--headless=new")
+    options.add_argument("--window-size=1920,1080")
+    options.add_argument("--disable-extensions")
+    options.add_experimental_option("prefs", {"profile.managed_default_content_settings.images": 2})
+    options.page_load_strategy = "eager"
+  driver = base.initialize_driver()
+  prepare_tab(driver, config)
+  return driver
+# end of initialize_driver
+
+def prepare_tab(driver, config):
+  # URL blocking is set per tab, so this runs again for every tab opened
+  if config["browser"]["profile"] != "fast":
+    return
+  driver.execute_cdp_cmd("Network.enable", {})
+  driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": FONT_URLS + config["browser"]["blocked_urls"]})
+# end of prepare_tab
@@ -0,0 +1,69 @@
+import json
+import sqlite3
+import time
+from decimal import Decimal
+from .address import normalize_address
+
+class ResultCache:
+  # Stores what each source returned for an address in SQLite so reruns
+  # only scrape the sources whose data has gone stale.
+
+  def __init__(self, path, ttl_hours):
+    self.ttl_hours = ttl_hours
+    self.connection = sqlite3.connect(path, timeout=30)
+    # Batch workers each open their own connection to the same file
+    self.connection.execute("PRAGMA journal_mode=WAL")
+    self.connection.execute("""
+      CREATE TABLE IF NOT EXISTS results (
+        address_key TEXT NOT NULL,
+        source TEXT NOT NULL,
+        data TEXT NOT NULL,
+        fetched_at REAL NOT NULL,
+        PRIMARY KEY (address_key, source)
+      )
+    """)
+    self.connection.commit()
+
+  def ttl(self, source):
+    # Seconds a source's result stays fresh. PropStream's property fields and
+    # comps come from one scrape, so they expire together.
+    return self.ttl_hours[source] * 3600
+  # end of ttl
+
+  def get(self, property_address, source):
+    row = self.connection.execute(
+      "SELECT data, fetched_at FROM results WHERE address_key = ? AND source = ?",
+      (normalize_address(property_address), source)
+    ).fetchone()
+    if not row:
+      return None
+    data, fetched_at = row
+    if time.time() - fetched_at > self.ttl(source):
+      return None
+    return json.loads(data, object_hook=decode)
+  # end of get
+
+  def put(self, property_address, source, info):
+    self.connection.execute(
+      "INSERT OR REPLACE INTO results (address_key, source, data, fetched_at) VALUES (?, ?, ?, ?)",
+      (normalize_address(property_address), source, json.dumps(info, default=encode), time.time())
+    )
+    self.connection.commit()
+  # end of put
+
+  def close(self):
+    self.connection.close()
+  # end of close
+
+# PropStream's average sale price is a Decimal, which JSON has no type for
+def encode(value):
+  if isinstance(value, Decimal):
+    return {"$decimal": str(value)}
+  raise TypeError(f"{type(value).__name__} is not JSON serializable")
+# end of encode
+
+def decode(value):
+  if "$decimal" in value:
+    return Decimal(value["$decimal"])
+  return value
+# end of decode
@@ -0,0 +1,125 @@
+import datetime
+import numpy as np
+import pandas as pd
+from .comps import comps_arv
+
+# config["renovation"] key -> column the rehab estimate is written to
+RENOVATION_TIERS = {
+  "tier_1": "rehab_tier_1",
+  "tier_1.5": "rehab_tier_1_5",
+  "tier_2": "rehab_tier_2",
+  "tier_2.5": "rehab_tier_2_5",
+  "tier_3": "rehab_tier_3",
+  "tier_3.5": "rehab_tier_3_5",
+  "tier_1925": "rehab_tier_1925"
+}
+
+# Columns the calculator reads. Money columns may be numbers or text like
+# "$425,000". Any that are missing are treated as unknown.
+MONEY_COLUMNS = ["average_sale_price", "arv", "ask_price", "mortgage", "repairs"]
+NUMBER_COLUMNS = ["square_footage", "year_built"]
+
+def to_number(column):
+  if pd.api.types.is_numeric_dtype(column):
+    return column.astype(float)
+  text = column.astype("string").str.replace(r"[^\d.\-]", "", regex=True)
+  return pd.to_numeric(text, errors="coerce")
+# end of to_number
+
+def underwrite_frame(frame, config):
+  # Adds every underwriting figure to a table of properties, one column at a
+  # time, so re-running the numbers after a change to config.json costs
+  # nothing per property.
+  FEE = config["underwriting"]["fee"]
+  BUYER_CREDIT = config["underwriting"]["buyer_credit"]
+  WHOLESALE_DISCOUNT = config["underwriting"]["wholesale_discount"]
+  QUICK_CHECK = config["underwriting"]["quick_check"]
+  REPAIR_TIER = config["underwriting"]["repair_tier"]
+
+  frame = frame.copy()
+  for column in MONEY_COLUMNS + NUMBER_COLUMNS:
+    frame[column] = to_number(frame[column]) if column in frame else np.nan
+  if "comps" in frame:
+    fill_arv(frame, config)
+
+  for tier, column in RENOVATION_TIERS.items():
+    frame[column] = frame["square_footage"] * config["renovation"][tier]
+  frame["quick_check"] = frame["average_sale_price"] * QUICK_CHECK
+
+  # Repairs given in the input win over the configured tier
+  frame["repairs"] = frame["repairs"].fillna(frame[RENOVATION_TIERS[REPAIR_TIER]])
+  frame["mao_wholesale"] = frame["arv"] * WHOLESALE_DISCOUNT - frame["repairs"] - FEE - BUYER_CREDIT
+  frame["percent_of_arv"] = frame["mao_wholesale"] / frame["arv"].where(frame["arv"] > 0)
+  frame["amount_under_asking"] = frame["ask_price"] - frame["mao_wholesale"]
+  frame["seller_profit"] = frame["mao_wholesale"] - frame["mortgage"]
+  return frame
+# end of underwrite_frame
+
+def fill_arv(frame, config):
+  # Batch results carry PropStream's raw comps instead of an ARV, so work it
+  # out for every row that has comps but no ARV, all rows at once, aging the
+  # comps from the day each row was underwritten
+  missing = frame["arv"].isna() & frame["comps"].map(lambda comps: isinstance(comps, (list, dict)))
+  if not missing.any():
+    return
+  subjects = pd.DataFrame({field: to_number(frame[field]) if field in frame else np.nan for field in ("square_footage", "bedrooms", "bathrooms")}, index=frame.index)
+  frame.loc[missing, "arv"] = comps_arv(frame.loc[missing, "comps"], subjects[missing], run_dates(frame[missing]), config)
+# end of fill_arv
+
+def run_dates(frame):
+  # The day each row was underwritten, from underwritten_at in epoch seconds
+  # (batch results) or as a timestamp (--export), or today when it's missing
+  today = pd.Timestamp(datetime.date.today())
+  if "underwritten_at" not in frame:
+    return pd.Series(today, index=frame.index)
+  column = frame["underwritten_at"]
+  seconds = pd.to_numeric(column, errors="coerce")
+  dates = seconds.map(lambda value: pd.Timestamp(datetime.date.fromtimestamp(value)), na_action="ignore")
+  stamped = pd.to_datetime(column.where(seconds.isna()), errors="coerce", utc=True).dt.tz_localize(None).dt.normalize()
+  return dates.astype("datetime64[ns]").fillna(stamped).fillna(today)
+# end of run_dates
+
+def underwrite_property(propstream_info, listing_info, arv, config):
+  # The same math for a single property, as used by the notes
+  row = {
+    "square_footage": propstream_info["square_footage"] if propstream_info["square_footage"] != "" else None,
+    "year_built": propstream_info["year_built"] if propstream_info["year_built"] != "" else None,
+    "average_sale_price": propstream_info["average_sale_price"] if propstream_info["average_sale_price"] != "N/A" else None,
+    "mortgage": propstream_info["mortgage"],
+    "ask_price": listing_info["ask_price"],
+    "arv": arv
+  }
+  frame = pd.DataFrame([row]).astype({"square_footage": float, "year_built": float, "average_sale_price": float, "arv": float})
+  return underwrite_frame(frame, config).iloc[0].to_dict()
+# end of underwrite_property
+
+def flatten_results(frame):
+  # Batch results (--output) nest each source's fields under propstream_info
+  # and listing_info. Lift them up to plain columns.
+  if "propstream_info" not in frame and "listing_info" not in frame:
+    return frame
+  flat = pd.json_normalize(frame.to_dict("records"), max_level=1)
+  flat.columns = [column.split(".", 1)[-1] for column in flat.columns]
+  return flat.loc[:, ~flat.columns.duplicated()]
+# end of flatten_results
+
+def read_table(path):
+  lower = path.lower()
+  if lower.endswith(".parquet"):
+    frame = pd.read_parquet(path)
+  elif lower.endswith((".jsonl", ".ndjson")):
+    frame = pd.read_json(path, lines=True, dtype=False)
+  else:
+    frame = pd.read_csv(path, dtype=str)
+  return flatten_results(frame)
+# end of read_table
+
+def write_table(frame, path):
+  lower = path.lower()
+  if lower.endswith(".parquet"):
+    frame.to_parquet(path, index=False)
+  elif lower.endswith((".jsonl", ".ndjson")):
+    frame.to_json(path, orient="records", lines=True)
+  else:
+    frame.to_csv(path, index=False)
+# end of write_table
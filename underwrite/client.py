@@ -0,0 +1,37 @@
+import json
+import requests
+from .cache import decode
+
+# Seconds the CLI waits to find out whether a daemon is listening before it
+# falls back to underwriting in-process
+CONNECT_TIMEOUT = 1
+
+class DaemonClient:
+  # What the CLI uses to hand an address to a running daemon
+
+  def __init__(self, config):
+    self.url = f"http://{config['daemon']['host']}:{config['daemon']['port']}"
+
+  def is_running(self):
+    # Anything else could be listening on the port, so only a /status
+    # shaped like the daemon's counts
+    try:
+      response = requests.get(f"{self.url}/status", timeout=CONNECT_TIMEOUT)
+      status = response.json()
+    except (requests.RequestException, ValueError):
+      return False
+    return response.status_code == 200 and isinstance(status, dict) and {"started", "jobs"} <= status.keys()
+  # end of is_running
+
+  def underwrite(self, property_address):
+    # No read timeout, a job takes as long as the sites do
+    response = requests.post(f"{self.url}/underwrite", json={"property_address": property_address}, timeout=(CONNECT_TIMEOUT, None))
+    body = json.loads(response.text, object_hook=decode)
+    if response.status_code != 200:
+      raise RuntimeError(body["error"])
+    return body
+  # end of underwrite
+
+  def shutdown(self):
+    requests.post(f"{self.url}/shutdown", timeout=CONNECT_TIMEOUT)
+  # end of shutdown
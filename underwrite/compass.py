@@ -0,0 +1,136 @@
+from re import sub
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+from .extract import parse_phone
+from .profiler import profiled
+from .site import Site
+
+URL_COMPASS = "https://www.compass.com/"
+SEARCH_INPUT_CSS = "input[aria-describedBy='location-lookup-input-description']"
+LOG_IN_CSS = "button[data-label='Log In']"
+# Still on the search page, or told the address has no results
+NOT_FOUND_XPATH = "//input[@aria-describedBy='location-lookup-input-description'] | //*[starts-with(normalize-space(text()), 'No results')]"
+
+#region Fields
+# Listing page, once the MLS # has loaded
+COMPASS_LISTING_FIELDS = {
+  "remarks": {
+    "xpaths": [
+      "//div[contains(@class, 'textIntent-body')]/div/span[2]",
+      "//div[contains(@class, 'textIntent-body')]/div/span"
+    ],
+    "attribute": "textContent",
+    "default": "Didn't find on Compass"
+  },
+  "listing_agent": {"xpaths": ["//div[contains(@class, 'contact-agent')]/p[1]"]},
+  "listing_brokerage": {"xpaths": ["//div[contains(@class, 'contact-agent')]/p[2]"]},
+  "listing_agent_dre": {"xpaths": ["//div[contains(@class, 'contact-agent')]/p[contains(text(), 'DRE #')]"]},
+  "listing_agent_phone": {"xpaths": ["//div[contains(@class, 'contact-agent')]/div/p[contains(text(), 'P:')]"]},
+  "listing_agent_email": {"xpaths": ["//div[contains(@class, 'contact-agent')]/a[contains(@href, 'mailto')]"]},
+  "courtesy": {"xpaths": ["//span[@data-tn='courtesy-of-text']"]},
+  "ask_price": {"xpaths": ["//div[text()='Price']//preceding-sibling::div"], "default": "Didn't find on Compass"},
+  "days_on_market": {"xpaths": ["//th[text()='Days on Compass']/following-sibling::td"], "default": "N/A"},
+  "pool": {"xpaths": ["//div[contains(text(), 'Pool')]/span"], "default": "Didn't find on Compass"}
+}
+#endregion Fields
+
+class Compass(Site):
+  NAME = "compass"
+  URL = URL_COMPASS
+  REQUIRES_LOGIN = True
+
+  def __init__(self, driver, config, profiler=None, latencies=None):
+    super().__init__(driver, config, profiler, latencies)
+    #region Constants
+    self.EMAIL = config["compass"]["email"]
+    self.PASSWORD = config["compass"]["password"]
+    #endregion Constants
+    self.URL = config["compass"]["url"]
+
+  def sign_in(self):
+    self.sign_into_compass(self.EMAIL, self.PASSWORD)
+  # end of sign_in
+
+  def is_signed_in(self):
+    # The search input renders either way, and by then a signed out visitor
+    # would also be shown the Log In button
+    try:
+      self.wait.for_element_located((By.CSS_SELECTOR, SEARCH_INPUT_CSS))
+    except TimeoutException:
+      return False
+    return not self.driver.find_elements(By.CSS_SELECTOR, LOG_IN_CSS)
+  # end of is_signed_in
+
+  def get_info(self, property_address):
+    return self.get_info_from_compass(property_address)
+  # end of get_info
+
+  @profiled
+  def sign_into_compass(self, email, password):
+    driver = self.driver
+    wait = self.wait
+    log_in = wait.for_element_located((By.CSS_SELECTOR, LOG_IN_CSS), self.TIMEOUT_SEARCH)
+    log_in.click()
+    wait.until_clickable((By.CSS_SELECTOR, ".uc-authentication button:nth-child(5)")).click()
+    # Found before the last Continue, since a quick login can close the
+    # modal before a later lookup would see it
+    forgot_password = wait.for_element_located((By.CSS_SELECTOR, ".uc-authentication-footer button"))
+    if email:
+      wait.until_clickable((By.CSS_SELECTOR, "input[name='email']")).send_keys(email)
+      wait.until_clickable((By.ID, "continue")).click()
+      if password:
+        wait.until_clickable((By.CSS_SELECTOR, "input[name='password']")).send_keys(password)
+        wait.until_clickable((By.ID, "continue")).click()
+
+    # Wait for user to log into compass.com
+    # Wait for "Forgot Password" button to disappear
+    WebDriverWait(driver, self.TIMEOUT_LOGIN).until(EC.staleness_of(forgot_password))
+  # end of sign_into_compass
+
+  @profiled
+  def get_info_from_compass(self, property_address):
+    driver = self.driver
+    wait = self.wait
+    search = wait.until_clickable((By.CSS_SELECTOR, SEARCH_INPUT_CSS))
+    search.click()
+    search.send_keys(property_address)
+    try:
+      mls_number = wait.for_element_located((By.XPATH, "//th[text()='MLS #']/following-sibling::td"), optional=True).text
+    except TimeoutException:
+      self.expect_page(NOT_FOUND_XPATH)
+      self.profiler.branch("compass.listing", "not_found")
+      return 1
+    self.profiler.branch("compass.listing", "found")
+    listing = self.extract(COMPASS_LISTING_FIELDS)
+
+    # Get Listing Agent Info
+    agent_fields = ("listing_agent", "listing_brokerage", "listing_agent_dre", "listing_agent_phone", "listing_agent_email")
+    if all(listing[field] is not None for field in agent_fields):
+      listed_by = f"{listing['listing_brokerage']}, {listing['listing_agent']}, {listing['listing_agent_dre']}"
+      listing_agent_phone = parse_phone(listing["listing_agent_phone"])
+      listing_agent_email = listing["listing_agent_email"]
+      self.profiler.branch("compass.listed_by", "agent")
+    else:
+      if listing["courtesy"] is not None:
+        listed_by = sub("Listing Courtesy of ", "", listing["courtesy"])
+        self.profiler.branch("compass.listed_by", "courtesy")
+      else:
+        listed_by = "Didn't find on Compass"
+        self.profiler.branch("compass.listed_by", "not_found")
+      listing_agent_phone = "Didn't find on Compass"
+      listing_agent_email = "Didn't find on Compass"
+
+    return {
+      "mls_number": mls_number,
+      "remarks": listing["remarks"],
+      "listed_by": listed_by,
+      "listing_agent_phone": listing_agent_phone,
+      "listing_agent_email": listing_agent_email,
+      "ask_price": listing["ask_price"],
+      "days_on_market": "Days on Compass: " + listing["days_on_market"],
+      "pool": listing["pool"],
+      "pictures": driver.current_url
+    }
+  # end of get_info_from_compass
@@ -0,0 +1,129 @@
+import datetime
+import numpy as np
+import pandas as pd
+
+COMP_COLUMNS = ["address", "sale_date", "sale_price", "square_footage", "bedrooms", "bathrooms", "year_built", "distance"]
+NUMERIC_COLUMNS = ["sale_price", "square_footage", "bedrooms", "bathrooms", "year_built", "distance"]
+
+def comps_frame(comps):
+  # Turn the raw comps columns scraped from PropStream into typed columns.
+  # Rows without a sale price or square footage can't be used for $/sqft.
+  return typed_comps(pd.DataFrame(comps or {}).reindex(columns=COMP_COLUMNS))
+# end of comps_frame
+
+def long_comps(comps):
+  # Every property's comps in one typed frame, with a "row" column holding
+  # the index of the property they belong to. comps is a Series of what
+  # PropStream returned: a dict of column lists, or a list of row dicts.
+  columns = {column: [] for column in COMP_COLUMNS}
+  rows = []
+  for row, raw in comps.items():
+    if isinstance(raw, dict):
+      count = max((len(values) for values in raw.values() if isinstance(values, list)), default=0)
+      for column in COMP_COLUMNS:
+        values = raw.get(column)
+        values = values if isinstance(values, list) else []
+        columns[column].extend(values[:count] + [None] * (count - len(values)))
+    elif isinstance(raw, list):
+      raw = [comp for comp in raw if isinstance(comp, dict)]
+      count = len(raw)
+      for column in COMP_COLUMNS:
+        columns[column].extend(comp.get(column) for comp in raw)
+    else:
+      continue
+    rows.extend([row] * count)
+  return typed_comps(pd.DataFrame(columns, columns=COMP_COLUMNS).assign(row=rows))
+# end of long_comps
+
+def typed_comps(frame):
+  for column in NUMERIC_COLUMNS:
+    text = frame[column].astype("string").str.replace(r"[^\d.]", "", regex=True)
+    frame[column] = pd.to_numeric(text, errors="coerce")
+  frame["sale_date"] = pd.to_datetime(frame["sale_date"], format="%m/%d/%Y", errors="coerce")
+  frame = frame[(frame["sale_price"] > 0) & (frame["square_footage"] > 0)].copy()
+  frame["price_per_sqft"] = frame["sale_price"] / frame["square_footage"]
+  return frame
+# end of typed_comps
+
+def price_comps(frame, subjects, dates, config):
+  # Adds each comp's weight and its value as if it were the subject to a
+  # frame from long_comps. subjects holds every property's square_footage,
+  # bedrooms and bathrooms, and dates the day its comps are aged from, both
+  # indexed like the rows.
+  settings = config["comps"]
+  age_days = (frame["row"].map(dates) - frame["sale_date"]).dt.days.astype(float)
+  # Undated or unmeasured comps count as the oldest or farthest of their property's
+  age_days = age_days.fillna(age_days.groupby(frame["row"]).transform("max")).fillna(0).clip(lower=0)
+  distance = frame["distance"].fillna(frame["distance"].groupby(frame["row"]).transform("max")).fillna(0)
+  frame["weight"] = 0.5 ** (age_days / settings["recency_half_life_days"]) * 0.5 ** (distance / settings["distance_half_life_miles"])
+
+  subject = subjects.reindex(columns=["square_footage", "bedrooms", "bathrooms"]).apply(pd.to_numeric, errors="coerce").reindex(frame["row"])
+  subject.index = frame.index
+  sqft = subject["square_footage"]
+  base_value = (frame["price_per_sqft"] * sqft).where(sqft > 0, frame["sale_price"])
+  # A comp with an extra bed or bath sold for more than the subject would,
+  # and one with fewer sold for less
+  adjustment = pd.Series(0.0, index=frame.index)
+  for field, amount in (("bedrooms", settings["bed_adjustment"]), ("bathrooms", settings["bath_adjustment"])):
+    adjustment += ((subject[field] - frame[field]) * amount).fillna(0)
+  frame["adjusted_value"] = base_value + adjustment
+  return frame
+# end of price_comps
+
+def weighted_arvs(frame, config):
+  # Per row of a priced frame: (weighted ARV, final ARV rounded down to the
+  # $1,000 after the market adjustment). Rows whose weights are all 0 fall
+  # back to the plain mean.
+  frame = frame.assign(weighted_value=frame["adjusted_value"] * frame["weight"])
+  sums = frame.groupby("row")[["weighted_value", "weight", "adjusted_value"]].agg({"weighted_value": "sum", "weight": "sum", "adjusted_value": "mean"})
+  weighted = (sums["weighted_value"] / sums["weight"]).where(sums["weight"] > 0, sums["adjusted_value"])
+  final = np.floor(weighted * (1 - config["comps"]["market_adjustment"]) / 1000) * 1000
+  return weighted, final
+# end of weighted_arvs
+
+def comps_arv(comps, subjects, dates, config):
+  # Final ARV of every property at once, NaN where there are no usable comps
+  frame = long_comps(comps)
+  if frame.empty:
+    return pd.Series(np.nan, index=comps.index)
+  _, final = weighted_arvs(price_comps(frame, subjects, dates, config), config)
+  return final.reindex(comps.index).astype(float)
+# end of comps_arv
+
+def trimmed_mean(values, trim):
+  # Mean after dropping the given fraction from each end
+  values = np.sort(np.asarray(values, dtype=float))
+  cut = int(len(values) * trim)
+  if len(values) - 2 * cut <= 0:
+    return float(values.mean())
+  return float(values[cut:len(values) - cut].mean())
+# end of trimmed_mean
+
+def analyze_comps(comps, subject, config, today=None):
+  # Returns None when there are no usable comps. Otherwise every comp is
+  # priced as if it were the subject (its $/sqft times the subject's square
+  # footage, plus the bed/bath adjustments), and those values are averaged
+  # with more weight on recent and nearby sales.
+  settings = config["comps"]
+  frame = comps_frame(comps)
+  if frame.empty:
+    return None
+
+  frame["row"] = 0
+  today = pd.Timestamp(today or datetime.date.today())
+  subjects = pd.DataFrame([{field: subject.get(field) for field in ("square_footage", "bedrooms", "bathrooms")}], dtype=object)
+  frame = price_comps(frame, subjects, pd.Series([today]), config)
+  weighted, final = weighted_arvs(frame, config)
+  weighted_arv = float(weighted[0])
+
+  return {
+    "count": len(frame),
+    "median_sale_price": float(frame["sale_price"].median()),
+    "median_price_per_sqft": float(frame["price_per_sqft"].median()),
+    "trimmed_mean_price_per_sqft": trimmed_mean(frame["price_per_sqft"], settings["trim"]),
+    "weighted_arv": weighted_arv,
+    "market_adjusted_arv": weighted_arv * (1 - settings["market_adjustment"]),
+    "final_arv": float(final[0]),
+    "comps": frame.drop(columns="row").sort_values("weight", ascending=False)
+  }
+# end of analyze_comps
@@ -0,0 +1,26 @@
+import os
+import sys
+from python_utils.functions import load_json
+
+# The config.json shipped with the build (see underwrite-property.spec), or
+# the one next to underwrite-property.py when run from source
+DEFAULTS_PATH = os.path.join(getattr(sys, "_MEIPASS", os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "config.json")
+
+def load_config(path):
+  # A config.json from an older version lacks the sections added since, so
+  # anything it leaves out comes from the shipped defaults
+  config = load_json(path)
+  if not os.path.exists(DEFAULTS_PATH):
+    return config
+  return merge(load_json(DEFAULTS_PATH), config)
+# end of load_config
+
+def merge(defaults, config):
+  merged = dict(defaults)
+  for key, value in config.items():
+    if isinstance(value, dict) and isinstance(merged.get(key), dict):
+      merged[key] = merge(merged[key], value)
+    else:
+      merged[key] = value
+  return merged
+# end of merge
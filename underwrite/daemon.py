@@ -0,0 +1,123 @@
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from python_utils.functions import cprint
+from .cache import encode
+from .notes import record_run
+from .profiler import Profiler
+from .store import UnderwritingStore
+from .underwriter import Underwriter, browser_failed
+
+class UnderwriteDaemon:
+  # Keeps one Underwriter, with its browsers started and signed in, alive
+  # between jobs and serves them over HTTP on localhost:
+  #   GET  /status      {"started": bool, "jobs": int}
+  #   GET  /profile     the profile of every job so far, when profiling
+  #   POST /underwrite  {"property_address": str} -> {"result": {...}, "run_id": int, "notes": str, "notes_file": str}
+  #   POST /shutdown
+  #
+  # Drivers and SQLite connections may only be used from the thread that
+  # created them, so every job runs on a single job thread no
+  # matter which request thread received it. Jobs queue up in arrival order.
+
+  def __init__(self, config, profiler=None):
+    self.config = config
+    self.profiler = profiler or Profiler(enabled=False)
+    #region Constants
+    self.HOST = config["daemon"]["host"]
+    self.PORT = config["daemon"]["port"]
+    self.STORE_PATH = config["store"]["path"]
+    #endregion Constants
+    self.jobs = ThreadPoolExecutor(max_workers=1)
+    self.job_count = 0
+    self.underwriter = self.jobs.submit(Underwriter, config, self.profiler).result()
+    self.store = self.jobs.submit(UnderwritingStore, self.STORE_PATH).result()
+    self.server = ThreadingHTTPServer((self.HOST, self.PORT), handler(self))
+    self.server.daemon_threads = True
+
+  def serve(self):
+    try:
+      # Pay for Chrome and the logins now rather than on the first job
+      self.jobs.submit(self.underwriter.start).result()
+      cprint(f"<g>Listening on http://{self.HOST}:{self.PORT}/")
+      self.server.serve_forever()
+    finally:
+      self.server.server_close()
+      self.jobs.submit(self.underwriter.close).result()
+      self.jobs.submit(self.store.close).result()
+      self.jobs.shutdown()
+  # end of serve
+
+  def shutdown(self):
+    # server.shutdown() waits for serve_forever() to return, which can't
+    # happen while the request asking for it is still being handled
+    threading.Thread(target=self.server.shutdown).start()
+  # end of shutdown
+
+  def status(self):
+    return {"started": self.underwriter.started, "jobs": self.job_count}
+  # end of status
+
+  def underwrite(self, property_address):
+    return self.jobs.submit(self.run_job, property_address).result()
+  # end of underwrite
+
+  def run_job(self, property_address):
+    cprint(f"<g>Underwriting {property_address}...")
+    try:
+      result = self.underwriter.underwrite(property_address)
+    except Exception as e:
+      # The next job starts the browsers over if they're what failed
+      if browser_failed(e):
+        self.underwriter.quit()
+      raise
+    finally:
+      self.job_count += 1
+    with self.profiler.stage("record_run"):
+      run, notes = record_run(self.store, result, "daemon", self.config)
+    return {"result": result, "run_id": run["id"], "notes": notes, "notes_file": run["notes_file"]}
+  # end of run_job
+
+def handler(daemon):
+  class Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+      if self.path == "/status":
+        self.respond(200, daemon.status())
+      elif self.path == "/profile":
+        self.respond(200, daemon.profiler.report())
+      else:
+        self.respond(404, {"error": f"No such path {self.path}"})
+
+    def do_POST(self):
+      if self.path == "/shutdown":
+        self.respond(200, {})
+        daemon.shutdown()
+      elif self.path == "/underwrite":
+        try:
+          length = int(self.headers.get("Content-Length", 0))
+          property_address = json.loads(self.rfile.read(length))["property_address"]
+        except (ValueError, KeyError, TypeError):
+          self.respond(400, {"error": "Expected {\"property_address\": \"...\"}"})
+          return
+        try:
+          self.respond(200, daemon.underwrite(property_address))
+        except Exception as e:
+          self.respond(500, {"error": f"{e}"})
+      else:
+        self.respond(404, {"error": f"No such path {self.path}"})
+
+    def respond(self, status, body):
+      data = json.dumps(body, default=encode).encode("utf-8")
+      self.send_response(status)
+      self.send_header("Content-Type", "application/json")
+      self.send_header("Content-Length", str(len(data)))
+      self.end_headers()
+      self.wfile.write(data)
+
+    def log_message(self, format, *args):
+      # The default writes every request to stderr, which a --noconsole
+      # build doesn't have. Jobs are already announced by run_job.
+      pass
+  return Handler
+# end of handler
@@ -0,0 +1,123 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from .calculator import RENOVATION_TIERS, to_number, underwrite_frame
+
+# Every exported column and its type, in order. Money and counts that a site
+# showed as text ("$425,000", "Days on Compass: 12") are parsed into numbers,
+# and text like "Didn't find on Compass" becomes null.
+EXPORT_SCHEMA = pa.schema(
+  [
+    ("run_id", pa.int64()),
+    ("property_address", pa.string()),
+    ("underwritten_at", pa.timestamp("s", tz="UTC")),
+    ("source", pa.string()),
+    # PropStream
+    ("owner", pa.string()),
+    ("mortgage", pa.float64()),
+    ("square_footage", pa.float64()),
+    ("distressed", pa.string()),
+    ("owner_status", pa.string()),
+    ("year_built", pa.int64()),
+    ("bedrooms", pa.float64()),
+    ("bathrooms", pa.float64()),
+    ("average_sale_price", pa.float64()),
+    # Compass/Redfin
+    ("mls_number", pa.string()),
+    ("ask_price", pa.float64()),
+    ("days_on_market", pa.int64()),
+    ("listed_by", pa.string()),
+    ("listing_agent_phone", pa.string()),
+    ("listing_agent_email", pa.string()),
+    ("remarks", pa.string()),
+    ("pool", pa.string()),
+    ("pictures", pa.string()),
+    # Computed
+    ("arv", pa.float64())
+  ]
+  + [(column, pa.float64()) for column in RENOVATION_TIERS.values()]
+  + [(column, pa.float64()) for column in ["quick_check", "repairs", "mao_wholesale", "percent_of_arv", "amount_under_asking", "seller_profit"]]
+)
+
+PROPSTREAM_COLUMNS = ["owner", "mortgage", "square_footage", "distressed", "owner_status", "year_built", "bedrooms", "bathrooms", "average_sale_price"]
+# Redfin's "Time on Redfin" is in whatever unit fits, e.g. "5 hours". A bare
+# number, like Compass's "Days on Compass: 12", is already in days.
+DAY_UNITS = {"minute": 1 / 1440, "hour": 1 / 24, "day": 1, "week": 7}
+
+LISTING_COLUMNS = ["mls_number", "ask_price", "days_on_market", "listed_by", "listing_agent_phone", "listing_agent_email", "remarks", "pool", "pictures"]
+
+def to_days(column):
+  # Whole days, or null for text without a number and a known unit
+  if pd.api.types.is_numeric_dtype(column):
+    return column.astype(float)
+  parts = column.astype("string").str.extract(r"(?i)([\d,.]+)\s*(?:(minute|hour|day|week)s?)?\s*$")
+  number = pd.to_numeric(parts[0].str.replace(",", "", regex=False), errors="coerce")
+  unit = parts[1].str.lower().map(DAY_UNITS).astype(float).fillna(1)
+  return np.floor(number * unit)
+# end of to_days
+
+def runs_frame(runs, config):
+  # One typed row per run, with the underwriting figures as of the day it
+  # was run. underwrite_frame works out every run's ARV from its comps.
+  rows = []
+  for run in runs:
+    propstream_info = run["propstream_info"]
+    listing_info = run["listing_info"]
+    row = {
+      "run_id": run["id"],
+      "property_address": run["property_address"],
+      "underwritten_at": run["underwritten_at"],
+      "source": run["source"],
+      "comps": propstream_info.get("comps"),
+      "arv": None
+    }
+    for column in PROPSTREAM_COLUMNS:
+      row[column] = propstream_info.get(column)
+    for column in LISTING_COLUMNS:
+      row[column] = listing_info.get(column)
+    rows.append(row)
+
+  frame = underwrite_frame(pd.DataFrame(rows), config)
+  frame["days_on_market"] = to_days(frame["days_on_market"])
+  for field in EXPORT_SCHEMA:
+    column = frame[field.name]
+    if field.type == pa.string():
+      frame[field.name] = column.map(lambda value: None if value is None or value is pd.NA or value != value else str(value))
+    elif field.type == pa.int64():
+      frame[field.name] = to_number(column).round().astype("Int64")
+    elif field.type == pa.float64():
+      frame[field.name] = to_number(column)
+  frame["underwritten_at"] = pd.to_datetime(frame["underwritten_at"], unit="s", utc=True).dt.floor("s")
+  return frame[EXPORT_SCHEMA.names]
+# end of runs_frame
+
+def export_runs(store, path, config, **filters):
+  # Streams every run matching filters (see UnderwritingStore.find) into a
+  # Parquet, CSV or JSONL file, export->chunk_size runs at a time, so memory
+  # use doesn't grow with the store. Returns how many runs were written.
+  CHUNK_SIZE = config["export"]["chunk_size"]
+  lower = path.lower()
+  count = 0
+  if lower.endswith(".parquet"):
+    # One row group per chunk
+    with pq.ParquetWriter(path, EXPORT_SCHEMA) as writer:
+      for runs in store.chunks(CHUNK_SIZE, **filters):
+        frame = runs_frame(runs, config)
+        writer.write_table(pa.Table.from_pandas(frame, schema=EXPORT_SCHEMA, preserve_index=False))
+        count += len(frame)
+    return count
+
+  jsonl = lower.endswith((".jsonl", ".ndjson"))
+  with open(path, "w", encoding="utf-8", newline="") as f:
+    if not jsonl:
+      f.write(",".join(EXPORT_SCHEMA.names) + "\n")
+    for runs in store.chunks(CHUNK_SIZE, **filters):
+      frame = runs_frame(runs, config)
+      if jsonl:
+        f.write(frame.to_json(orient="records", lines=True, date_format="iso").rstrip("\n") + "\n")
+      else:
+        frame.to_csv(f, index=False, header=False)
+      count += len(frame)
+  return count
+# end of export_runs
@@ -0,0 +1,189 @@
+import re
+from decimal import Decimal
+from re import sub
+import lxml.html
+
+# A field spec maps each field name to:
+#   xpaths: candidate XPaths, tried in order until one matches
+#   attribute: "text" for the element's visible text (the default), or the
+#     name of a property/attribute such as "textContent" or "href"
+#   parse: optional function applied to a non-empty value
+#   default: value used when no candidate matches or parse fails
+#
+# A table spec has a "rows" XPath and a "columns" field spec whose XPaths
+# are relative to each row. Tables come back as raw strings, one list per
+# column, and are left for the caller to parse a whole column at a time.
+# Grids that only render the rows in view also give:
+#   viewport: XPath of the scrolling element, scrolled top to bottom so
+#     every row gets rendered and read
+#   row_key: attribute identifying a row, so rows seen twice are read once
+#   total: field spec for the number of rows the grid says it has
+#   header_rows: XPath of header rows counted in that total
+#
+# extract() and extract_table() resolve a whole spec in the browser with one
+# script call. extract_html() and extract_table_html() resolve the same specs
+# against saved HTML so specs can be checked without a browser.
+
+RESOLVE_SCRIPT = """
+// Returns the value and the index of the XPath that found it, or -1
+function resolve(field, context) {
+  for (var i = 0; i < field.xpaths.length; i++) {
+    var node = document.evaluate(field.xpaths[i], context, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+    if (!node) continue;
+    if (field.attribute === "text") return [node.innerText, i];
+    if (node[field.attribute] !== undefined) return [String(node[field.attribute]), i];
+    return [node.getAttribute(field.attribute), i];
+  }
+  return [null, -1];
+}
+"""
+
+EXTRACT_SCRIPT = RESOLVE_SCRIPT + """
+var fields = arguments[0];
+var values = {};
+var matched = {};
+for (var name in fields) {
+  var result = resolve(fields[name], document);
+  values[name] = result[0];
+  matched[name] = result[1];
+}
+return {"values": values, "matched": matched};
+"""
+
+EXTRACT_TABLE_SCRIPT = RESOLVE_SCRIPT + """
+var table = arguments[0];
+var done = arguments[arguments.length - 1];
+function evaluate(xpath, type) {
+  return document.evaluate(xpath, document, null, type, null);
+}
+var viewport = table.viewport ? evaluate(table.viewport, XPathResult.FIRST_ORDERED_NODE_TYPE).singleNodeValue : null;
+var columns = {};
+var seen = {};
+var count = 0;
+for (var name in table.columns) columns[name] = [];
+function collect() {
+  var rows = evaluate(table.rows, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE);
+  for (var i = 0; i < rows.snapshotLength; i++) {
+    var row = rows.snapshotItem(i);
+    var key = table.row_key ? row.getAttribute(table.row_key) : null;
+    if (key !== null) {
+      if (seen[key]) continue;
+      seen[key] = true;
+    }
+    for (var name in table.columns) columns[name].push(resolve(table.columns[name], row)[0]);
+    count++;
+  }
+}
+function step() {
+  collect();
+  if (viewport && viewport.scrollTop + viewport.clientHeight < viewport.scrollHeight - 1) {
+    // Give the grid a moment to render the rows scrolled into view
+    viewport.scrollTop += Math.max(viewport.clientHeight, 1);
+    setTimeout(step, 100);
+    return;
+  }
+  var total = null;
+  if (table.total) {
+    total = parseInt(resolve(table.total, document)[0], 10);
+    if (isNaN(total)) total = null;
+    else if (table.header_rows) total -= evaluate(table.header_rows, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE).snapshotLength;
+  }
+  done({"columns": columns, "count": count, "total": total});
+}
+step();
+"""
+
+def script_fields(fields):
+  return {
+    name: {"xpaths": field["xpaths"], "attribute": field.get("attribute", "text")}
+    for name, field in fields.items()
+  }
+# end of script_fields
+
+def extract(driver, fields):
+  return extract_matched(driver, fields)[0]
+# end of extract
+
+def extract_matched(driver, fields):
+  # Also returns, for each field, the index of the XPath candidate that
+  # matched, or -1 when none did
+  raw = driver.execute_script(EXTRACT_SCRIPT, script_fields(fields))
+  return finish(fields, raw["values"]), raw["matched"]
+# end of extract_matched
+
+def extract_table(driver, table):
+  # Returns (columns, complete). complete is False when the grid says it
+  # has more rows than were read.
+  spec = {
+    "rows": table["rows"],
+    "columns": script_fields(table["columns"]),
+    "viewport": table.get("viewport"),
+    "row_key": table.get("row_key"),
+    "total": script_fields({"total": table["total"]})["total"] if "total" in table else None,
+    "header_rows": table.get("header_rows")
+  }
+  result = driver.execute_async_script(EXTRACT_TABLE_SCRIPT, spec)
+  return result["columns"], result["total"] is None or result["count"] >= result["total"]
+# end of extract_table
+
+def resolve_html(field, context):
+  attribute = field.get("attribute", "text")
+  for xpath in field["xpaths"]:
+    nodes = context.xpath(xpath)
+    if not nodes:
+      continue
+    if attribute in ("text", "textContent"):
+      return nodes[0].text_content()
+    return nodes[0].get(attribute)
+  return None
+# end of resolve_html
+
+def extract_html(html, fields):
+  tree = lxml.html.fromstring(html)
+  return finish(fields, {name: resolve_html(field, tree) for name, field in fields.items()})
+# end of extract_html
+
+def extract_table_html(html, table):
+  # Saved HTML holds every row, so there's nothing to scroll through
+  rows = lxml.html.fromstring(html).xpath(table["rows"])
+  return {
+    name: [resolve_html(field, row) for row in rows]
+    for name, field in table["columns"].items()
+  }
+# end of extract_table_html
+
+def finish(fields, raw):
+  values = {}
+  for name, field in fields.items():
+    value = raw.get(name)
+    if value is None:
+      values[name] = field.get("default")
+      continue
+    value = value.strip()
+    if value and "parse" in field:
+      try:
+        value = field["parse"](value)
+      except (ValueError, ArithmeticError, AttributeError):
+        value = field.get("default")
+    values[name] = value
+  return values
+# end of finish
+
+#region Parsers
+def parse_int(text):
+  return int(text.replace(",", ""))
+# end of parse_int
+
+def parse_float(text):
+  return float(text.replace(",", ""))
+# end of parse_float
+
+def parse_price(text):
+  price_match = re.search(r"(\$[\d,]*)", text)
+  return Decimal(sub(r"[^\d.]", "", price_match.group(1)))
+# end of parse_price
+
+def parse_phone(text):
+  return re.sub(r".*(\d{3})\.(\d{3})\.(\d{4})", r"(\1) \2-\3", text)
+# end of parse_phone
+#endregion Parsers
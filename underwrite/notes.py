@@ -0,0 +1,260 @@
+import datetime
+import os
+import pandas as pd
+from .calculator import underwrite_property
+from .comps import analyze_comps
+from .store import diff_runs, run_date
+
+def render_notes(property_address, propstream_info, listing_info, config, current_date, today=None):
+  # Comps are aged as of today, the actual date unless given
+  RENO_T1 = config["renovation"]["tier_1"]
+  RENO_T1_5 = config["renovation"]["tier_1.5"]
+  RENO_T2 = config["renovation"]["tier_2"]
+  RENO_T2_5 = config["renovation"]["tier_2.5"]
+  RENO_T3 = config["renovation"]["tier_3"]
+  RENO_T3_5 = config["renovation"]["tier_3.5"]
+  RENO_T1925 = config["renovation"]["tier_1925"]
+  QUICK_CHECK = config["underwriting"]["quick_check"]
+
+  comps = analyze_comps(propstream_info.get("comps"), propstream_info, config, today)
+  arv = comps["final_arv"] if comps else None
+  figures = underwrite_property(propstream_info, listing_info, arv, config)
+
+  notes = "# BASIC INFO\n"
+  notes += f"Address: {property_address}\n"
+  notes += f"MLS #: {listing_info['mls_number']}\n"
+  notes += f"{listing_info['days_on_market']} as of {current_date}\n"
+  notes += f"Listed by: {listing_info['listed_by']}\n"
+  notes += f"Agent's Phone: {listing_info['listing_agent_phone']}\n"
+  notes += f"Agent's Email: {listing_info['listing_agent_email']}\n"
+  notes += f"Owner: {propstream_info['owner']}\n"
+  notes += f"Owner Status: {propstream_info['owner_status']}\n"
+  notes += f"Distressed: {propstream_info['distressed']}\n"
+  notes += f"Year Built: {propstream_info['year_built']}\n"
+  notes += f"Pool: {listing_info['pool']}\n"
+  notes += f"Pictures: {listing_info['pictures']}\n"
+  notes += f"Listing Remarks: {listing_info['remarks']}\n"
+  notes += "\n"
+
+  notes += "## OTHER IMPORTANT INFORMATION\n"
+  notes += "-Sample 1\n"
+  if propstream_info.get("comps_complete") is False:
+    notes += "-Not every comp on PropStream could be read, so the ARV is from some of them\n"
+  notes += "\n"
+
+  if propstream_info['average_sale_price'] != "N/A":
+    notes += "## QUICK TEMP CHECK\n"
+    notes += f"Average Market Sale Price: {format_money(figures['average_sale_price'], 2)}\n"
+    notes += f"Price * {QUICK_CHECK * 100:g}%: {format_money(figures['quick_check'], 2)}\n"
+    notes += "\n"
+
+  notes += "# UNDERWRITING\n"
+  notes += f"## ORIGINAL {current_date}\n"
+  notes += render_underwriting(propstream_info, listing_info, figures, config)
+  notes += "\n"
+
+  notes += render_comparables(comps, config)
+  notes += render_arv_calculations(comps, config)
+
+  square_footage = f"{figures['square_footage']:,.0f}" if pd.notna(figures["square_footage"]) else ""
+  notes += "# REHAB ESTIMATE\n"
+  notes += f"Tier 1 (${RENO_T1}/sf): {format_money(figures['rehab_tier_1'])} on {square_footage}sf\n"
+  notes += f"Tier 1.5 (${RENO_T1_5}/sf): {format_money(figures['rehab_tier_1_5'])} on {square_footage}sf\n"
+  notes += f"Tier 2 (${RENO_T2}/sf): {format_money(figures['rehab_tier_2'])} on {square_footage}sf\n"
+  notes += f"Tier 2.5 (${RENO_T2_5}/sf): {format_money(figures['rehab_tier_2_5'])} on {square_footage}sf\n"
+  notes += f"Tier 3 (${RENO_T3}/sf): {format_money(figures['rehab_tier_3'])} on {square_footage}sf\n"
+  notes += f"Tier 3.5 (${RENO_T3_5}/sf): {format_money(figures['rehab_tier_3_5'])} on {square_footage}sf\n"
+
+  year_built = propstream_info['year_built']
+  if year_built == "" or year_built <= 1925:
+    notes += f"Year Built <= 1925 (${RENO_T1925}/sf): {format_money(figures['rehab_tier_1925'])} on {square_footage}sf\n"
+
+  notes += "Final Rehab Estimate (rounded up): \n"
+  return notes
+# end of render_notes
+
+def render_underwriting(propstream_info, listing_info, figures, config):
+  # Everything below the "## ORIGINAL {date}" header. Figures that depend
+  # on an ARV stay blank until there is one.
+  FEE = config["underwriting"]["fee"]
+  BUYER_CREDIT = config["underwriting"]["buyer_credit"]
+  WHOLESALE_DISCOUNT = config["underwriting"]["wholesale_discount"]
+  REPAIR_TIER = config["underwriting"]["repair_tier"]
+
+  notes = f"Asking Price {listing_info['ask_price']}\n"
+  notes += f"ARV {format_money(figures['arv'])}\n"
+  if pd.notna(figures["repairs"]):
+    notes += f"Repairs {format_money(figures['repairs'])} ({REPAIR_TIER.replace('_', ' ').title()})\n"
+  else:
+    notes += "Repairs \n"
+  notes += f"Your Fee {format_money(FEE)}\n"
+  notes += f"Credit to your buyer {format_money(BUYER_CREDIT)}\n"
+  notes += f"Wholesale Discount {WHOLESALE_DISCOUNT * 100:g}%\n"
+  notes += f"MAO Wholesale {format_money(figures['mao_wholesale'])}\n"
+  notes += f"% of ARV {format_percent(figures['percent_of_arv'])}\n"
+  notes += f"Amount under asking {format_money(figures['amount_under_asking'])}\n"
+  notes += f"Est. Mortgage {propstream_info['mortgage']}\n"
+  notes += f"Seller Profit Est {format_money(figures['seller_profit'])}\n"
+  return notes
+# end of render_underwriting
+
+def render_refresh(previous, run, config):
+  # A "## REFRESHED {date}" section for a run whose listing was scraped again
+  # on top of previous's PropStream data, noting what else the listing changed
+  propstream_info = run["propstream_info"]
+  listing_info = run["listing_info"]
+  comps = analyze_comps(propstream_info.get("comps"), propstream_info, config, datetime.date.fromtimestamp(run["underwritten_at"]))
+  arv = comps["final_arv"] if comps else None
+  figures = underwrite_property(propstream_info, listing_info, arv, config)
+
+  notes = f"## REFRESHED {run_date(run)}\n"
+  notes += f"{listing_info['days_on_market']} as of {run_date(run)}\n"
+  for field, (before, after) in diff_runs(previous, run).items():
+    if field not in ("ask_price", "days_on_market"):
+      notes += f"{field.replace('_', ' ').title()}: {after} (was {before})\n"
+  notes += render_underwriting(propstream_info, listing_info, figures, config)
+  notes += "\n"
+  return notes
+# end of render_refresh
+
+def insert_refresh(notes, section):
+  # Refreshes go at the end of the UNDERWRITING section, after the original
+  # and any earlier refreshes
+  index = notes.find("# COMPARABLES\n")
+  if index == -1:
+    return notes + section
+  return notes[:index] + section + notes[index:]
+# end of insert_refresh
+
+def render_comparables(comps, config):
+  # Lists the comps that weigh most in the ARV. Pool and pictures are still
+  # filled in by hand.
+  COMPS_NOTES_LIMIT = config["comps"]["notes_limit"]
+  notes = "# COMPARABLES\n"
+  if comps is None:
+    notes += "Comp:\n"
+    notes += "Address: \n"
+    notes += "Date Sold: \n"
+    notes += "Sold Price: \n"
+    notes += "Pool: \n"
+    notes += "Pictures: \n"
+    notes += "\n"
+    return notes
+  for comp in comps["comps"].head(COMPS_NOTES_LIMIT).itertuples():
+    date_sold = comp.sale_date.strftime('%m/%d/%y') if pd.notna(comp.sale_date) else ""
+    size = [f"{'{:,.0f}'.format(comp.square_footage)}sf", f"{'${:,.2f}'.format(comp.price_per_sqft)}/sf"]
+    if pd.notna(comp.bedrooms):
+      size.append(f"{comp.bedrooms:g} bd")
+    if pd.notna(comp.bathrooms):
+      size.append(f"{comp.bathrooms:g} ba")
+    if pd.notna(comp.distance):
+      size.append(f"{comp.distance:g} mi away")
+    notes += "Comp:\n"
+    notes += f"Address: {comp.address}\n"
+    notes += f"Date Sold: {date_sold}\n"
+    notes += f"Sold Price: {'${:,.0f}'.format(comp.sale_price)}\n"
+    notes += f"Size: {', '.join(size)}\n"
+    notes += "Pool: \n"
+    notes += "Pictures: \n"
+    notes += "\n"
+  return notes
+# end of render_comparables
+
+def render_arv_calculations(comps, config):
+  MARKET_ADJUSTMENT = config["comps"]["market_adjustment"]
+  BED_ADJUSTMENT = config["comps"]["bed_adjustment"]
+  BATH_ADJUSTMENT = config["comps"]["bath_adjustment"]
+  notes = "# ARV CALCULATIONS\n"
+  if comps is None:
+    notes += "Comp Sold Price: \n"
+    notes += "Comp $ / sqft: \n"
+    notes += "Subj Adj ARV: \n"
+    notes += f"Market Adjustment (-{MARKET_ADJUSTMENT * 100:g}%): \n"
+  else:
+    notes += f"Comp Sold Price: {'${:,.0f}'.format(comps['median_sale_price'])} (median of {comps['count']} comps)\n"
+    notes += f"Comp $ / sqft: {'${:,.2f}'.format(comps['median_price_per_sqft'])} median, {'${:,.2f}'.format(comps['trimmed_mean_price_per_sqft'])} trimmed mean\n"
+    notes += f"Subj Adj ARV: {'${:,.0f}'.format(comps['weighted_arv'])} (weighted by recency and distance)\n"
+    notes += f"Market Adjustment (-{MARKET_ADJUSTMENT * 100:g}%): {'${:,.0f}'.format(comps['market_adjusted_arv'])}\n"
+  notes += f"Comp has extra bed: -${BED_ADJUSTMENT / 1000:g}k\n"
+  notes += f"Comp has extra bath: -${BATH_ADJUSTMENT / 1000:g}k\n"
+  notes += f"Subj has extra bed: +${BED_ADJUSTMENT / 1000:g}k\n"
+  notes += f"Subj has extra bath: +${BATH_ADJUSTMENT / 1000:g}k\n"
+  if comps is None:
+    notes += "Final ARV Estimate (rounded down): \n"
+  else:
+    notes += f"Final ARV Estimate (rounded down): {'${:,.0f}'.format(comps['final_arv'])}\n"
+  notes += "\n"
+  return notes
+# end of render_arv_calculations
+
+def format_money(value, decimals=0):
+  # Unknown figures are left blank for the underwriter to fill in
+  if value is None or pd.isna(value):
+    return ""
+  # The sign goes before the $, and nothing that rounds to 0 gets one
+  value = round(value, decimals)
+  sign = "-" if value < 0 else ""
+  return f"{sign}${abs(value):,.{decimals}f}"
+# end of format_money
+
+def format_percent(value):
+  if value is None or pd.isna(value):
+    return ""
+  return f"{value * 100:.1f}%"
+# end of format_percent
+
+def render_run_notes(run, config):
+  # Notes for a stored run, dated the day it was underwritten
+  return render_notes(run["property_address"], run["propstream_info"], run["listing_info"], config, run_date(run), datetime.date.fromtimestamp(run["underwritten_at"]))
+# end of render_run_notes
+
+def write_notes(property_address, notes, directory, previous_runs=0):
+  # Returns the file name the notes ended up in. The first run of an address
+  # gets "{address}.md" and the nth after it "{address} ({n}).md". The store
+  # knows n, so the only names tried are ones left by runs it doesn't know.
+  os.makedirs(directory, exist_ok=True)
+  i = previous_runs
+  while True:
+    filename = f"{property_address}.md" if i == 0 else f"{property_address} ({i}).md"
+    try:
+      with open(os.path.join(directory, filename), "x", encoding="utf-8") as f:
+        f.write(notes)
+      return filename
+    except FileExistsError:
+      i += 1
+# end of write_notes
+
+def record_run(store, result, source, config):
+  # Stores a run and writes its notes. Returns the run and its notes.
+  NOTES_DIRECTORY = config["store"]["notes_directory"]
+  run = store.add(result, source)
+  notes = render_run_notes(run, config)
+  run["notes_file"] = write_notes(run["property_address"], notes, NOTES_DIRECTORY, store.count(run["property_address"]) - 1)
+  store.set_notes_file(run["id"], run["notes_file"])
+  return run, notes
+# end of record_run
+
+def record_refresh(store, previous, listing_info, config):
+  # Stores a run with a freshly scraped listing and previous's PropStream
+  # data, then adds a REFRESHED section to previous's notes file so anything
+  # written in it by hand is kept. Returns the run and the updated notes.
+  NOTES_DIRECTORY = config["store"]["notes_directory"]
+  run = store.add({
+    "property_address": previous["property_address"],
+    "propstream_info": previous["propstream_info"],
+    "listing_info": listing_info
+  }, "refresh")
+  path = os.path.join(NOTES_DIRECTORY, previous["notes_file"]) if previous["notes_file"] else None
+  if path and os.path.exists(path):
+    with open(path, "r", encoding="utf-8") as f:
+      notes = insert_refresh(f.read(), render_refresh(previous, run, config))
+    with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+      f.write(notes)
+    os.replace(f"{path}.tmp", path)
+    run["notes_file"] = previous["notes_file"]
+  else:
+    notes = render_run_notes(run, config)
+    run["notes_file"] = write_notes(run["property_address"], notes, NOTES_DIRECTORY, store.count(run["property_address"]) - 1)
+  store.set_notes_file(run["id"], run["notes_file"])
+  return run, notes
+# end of record_refresh
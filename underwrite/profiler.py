@@ -0,0 +1,186 @@
+import copy
+import functools
+import json
+import threading
+import time
+from contextlib import contextmanager
+from selenium.common.exceptions import TimeoutException
+
+# WebDriver commands that look an element up. Under an implicit wait, a
+# lookup for an element that isn't there stalls for the whole timeout.
+FIND_COMMANDS = ("findElement", "findElements", "findChildElement", "findChildElements")
+
+class Profiler:
+  # Collects where the time goes while underwriting:
+  #   stages: time spent in each stage (sign_into_*, get_info_from_*, ...)
+  #   commands: count and time of every WebDriver command sent
+  #   finds: time spent in find_element(s), by locator, implicit waits included
+  #   waits: time spent in explicit waits, by locator, and how many timed out
+  #   branches: how often each fallback branch was taken
+  #
+  # Sites in different threads share one Profiler. A disabled Profiler
+  # records nothing, so sites can call it unconditionally.
+
+  def __init__(self, enabled=True):
+    self.enabled = enabled
+    self.lock = threading.Lock()
+    self.started_at = time.time()
+    self.runs = 1
+    self.tables = {"stages": {}, "commands": {}, "finds": {}, "waits": {}}
+    self.branches = {}
+
+  def record(self, table, key, seconds, timed_out=False):
+    if not self.enabled:
+      return
+    with self.lock:
+      entry = self.tables[table].setdefault(key, {"count": 0, "seconds": 0.0, "max_seconds": 0.0, "timeouts": 0})
+      entry["count"] += 1
+      entry["seconds"] += seconds
+      entry["max_seconds"] = max(entry["max_seconds"], seconds)
+      entry["timeouts"] += timed_out
+  # end of record
+
+  def branch(self, name, taken):
+    if not self.enabled:
+      return
+    with self.lock:
+      counts = self.branches.setdefault(name, {})
+      counts[taken] = counts.get(taken, 0) + 1
+  # end of branch
+
+  @contextmanager
+  def stage(self, name):
+    start = time.perf_counter()
+    try:
+      yield
+    finally:
+      self.record("stages", name, time.perf_counter() - start)
+  # end of stage
+
+  def instrument(self, driver):
+    # Every WebDriver command goes through driver.execute, so replacing it on
+    # this one driver catches them all, CDP commands included
+    if not self.enabled:
+      return driver
+    execute = driver.execute
+    def timed_execute(driver_command, params=None):
+      start = time.perf_counter()
+      try:
+        return execute(driver_command, params)
+      finally:
+        seconds = time.perf_counter() - start
+        self.record("commands", driver_command, seconds)
+        if driver_command in FIND_COMMANDS and params:
+          self.record("finds", f"{params.get('using')}={params.get('value')}", seconds)
+    driver.execute = timed_execute
+    return driver
+  # end of instrument
+
+  def wrap_wait(self, wait):
+    return ProfiledWait(wait, self) if self.enabled else wait
+  # end of wrap_wait
+
+  def report(self):
+    with self.lock:
+      return {
+        "runs": self.runs,
+        "elapsed_seconds": time.time() - self.started_at,
+        **copy.deepcopy(self.tables),
+        "branches": copy.deepcopy(self.branches)
+      }
+  # end of report
+
+  def merge(self, report):
+    # Folds in the report of another run, e.g. each batch worker's
+    with self.lock:
+      self.runs += report["runs"]
+      for table in self.tables:
+        for key, other in report[table].items():
+          entry = self.tables[table].setdefault(key, {"count": 0, "seconds": 0.0, "max_seconds": 0.0, "timeouts": 0})
+          entry["count"] += other["count"]
+          entry["seconds"] += other["seconds"]
+          entry["max_seconds"] = max(entry["max_seconds"], other["max_seconds"])
+          entry["timeouts"] += other["timeouts"]
+      for name, counts in report["branches"].items():
+        totals = self.branches.setdefault(name, {})
+        for taken, count in counts.items():
+          totals[taken] = totals.get(taken, 0) + count
+  # end of merge
+
+  def write(self, path):
+    # Prometheus text for a .prom file, JSON for anything else
+    report = self.report()
+    with open(path, "w", encoding="utf-8") as f:
+      if path.lower().endswith(".prom"):
+        f.write(prometheus_text(report))
+      else:
+        json.dump(report, f, indent=2)
+  # end of write
+
+class ProfiledWait:
+  # Stands in for a selenium_utils.Wait and times every wait on a locator
+
+  def __init__(self, wait, profiler):
+    self.wait = wait
+    self.profiler = profiler
+
+  def __getattr__(self, name):
+    method = getattr(self.wait, name)
+    if not callable(method):
+      return method
+    @functools.wraps(method)
+    def timed(*args, **kwargs):
+      locator = args[0] if args and isinstance(args[0], tuple) else None
+      if locator is None:
+        return method(*args, **kwargs)
+      start = time.perf_counter()
+      timed_out = False
+      try:
+        return method(*args, **kwargs)
+      except TimeoutException:
+        timed_out = True
+        raise
+      finally:
+        self.profiler.record("waits", f"{locator[0]}={locator[1]}", time.perf_counter() - start, timed_out)
+    return timed
+  # end of __getattr__
+
+def profiled(method):
+  # Times a Site method as a stage named after the site and the method
+  @functools.wraps(method)
+  def wrapper(self, *args, **kwargs):
+    with self.profiler.stage(f"{self.NAME}.{method.__name__}"):
+      return method(self, *args, **kwargs)
+  return wrapper
+# end of profiled
+
+def prometheus_text(report):
+  lines = [
+    "# TYPE underwrite_runs_total counter",
+    f"underwrite_runs_total {report['runs']}",
+    "# TYPE underwrite_elapsed_seconds gauge",
+    f"underwrite_elapsed_seconds {report['elapsed_seconds']:.6f}"
+  ]
+  for table, label in (("stages", "stage"), ("commands", "command"), ("finds", "locator"), ("waits", "locator")):
+    metric = f"underwrite_{table}_seconds"
+    lines.append(f"# TYPE {metric} summary")
+    for key, entry in sorted(report[table].items()):
+      labels = f'{{{label}="{escape_label(key)}"}}'
+      lines.append(f"{metric}_sum{labels} {entry['seconds']:.6f}")
+      lines.append(f"{metric}_count{labels} {entry['count']}")
+    lines.append(f"# TYPE {metric}_max gauge")
+    for key, entry in sorted(report[table].items()):
+      lines.append(f'{metric}_max{{{label}="{escape_label(key)}"}} {entry["max_seconds"]:.6f}')
+  lines.append("# TYPE underwrite_wait_timeouts_total counter")
+  for key, entry in sorted(report["waits"].items()):
+    lines.append(f'underwrite_wait_timeouts_total{{locator="{escape_label(key)}"}} {entry["timeouts"]}')
+  lines.append("# TYPE underwrite_branches_total counter")
+  for name, counts in sorted(report["branches"].items()):
+    for taken, count in sorted(counts.items()):
+      lines.append(f'underwrite_branches_total{{branch="{escape_label(name)}",taken="{escape_label(taken)}"}} {count}')
+  return "\n".join(lines) + "\n"
+# end of prometheus_text
+
+def escape_label(value):
+  return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+# end of escape_label
@@ -0,0 +1,190 @@
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.common.by import By
+from .extract import extract_table, parse_float, parse_int, parse_price
+from .profiler import profiled
+from .site import Site
+
+URL_PROPSTREAM = "https://login.propstream.com/"
+SEARCH_INPUT_CSS = "input[placeholder='Enter County, City, Zip Code(s) or APN #']"
+
+#region Fields
+# Details tab, once a property has been opened
+PROPSTREAM_DETAILS_FIELDS = {
+  "owner": {"xpaths": ["//div[text()='Owner 1 Name']/following-sibling::div"], "default": ""},
+  "mortgage": {"xpaths": ["//div[text()='Est. Mortgage Balance']/preceding-sibling::div"], "default": ""}
+}
+
+# Property summary shown alongside the comparables tab
+PROPSTREAM_SUMMARY_FIELDS = {
+  "distressed": {"xpaths": ["//div[contains(text(),'Distressed')]/following-sibling::div"], "default": ""},
+  "owner_status": {"xpaths": ["//div[contains(text(),'Owner Status')]/following-sibling::div"], "default": ""},
+  "year_built": {"xpaths": ["//div[contains(text(),'Year Built')]/following-sibling::div"], "parse": parse_int, "default": ""},
+  "square_footage": {"xpaths": ["//div[contains(text(),'SqFt')]/following-sibling::div"], "parse": parse_int, "default": ""},
+  "bedrooms": {"xpaths": ["//div[contains(text(),'Beds')]/following-sibling::div"], "parse": parse_int, "default": ""},
+  "bathrooms": {"xpaths": ["//div[contains(text(),'Baths')]/following-sibling::div"], "parse": parse_float, "default": ""}
+}
+
+# Comparables tab, after the year built and public record filters are set
+PROPSTREAM_COMPS_FIELDS = {
+  "average_sale_price": {"xpaths": ["//div[contains(text(), 'Avg. Sale Price:')]"], "parse": parse_price, "default": "N/A"}
+}
+
+# Every row of the comparables grid, read as raw text and typed later by
+# underwrite.comps. The grid only renders the rows in view, so it's scrolled
+# through, and its aria-rowcount tells whether every row was read.
+PROPSTREAM_COMPS_TABLE = {
+  "rows": "//div[contains(@class, 'ag-center-cols-container')]/div[@role='row']",
+  "viewport": "//div[contains(@class, 'ag-body-viewport')]",
+  "row_key": "row-index",
+  "total": {"xpaths": ["//div[@aria-rowcount][contains(@class, 'ag-root')]", "//div[@aria-rowcount]"], "attribute": "aria-rowcount"},
+  "header_rows": "//div[contains(@class, 'ag-header-row')]",
+  "columns": {
+    "address": {"xpaths": [".//div[@col-id='streetAddress']", ".//div[@col-id='address']"]},
+    "sale_date": {"xpaths": [".//div[@col-id='saleDate']", ".//div[@col-id='lastSaleDate']"]},
+    "sale_price": {"xpaths": [".//div[@col-id='salePrice']", ".//div[@col-id='lastSaleAmount']"]},
+    "square_footage": {"xpaths": [".//div[@col-id='squareFeet']"]},
+    "bedrooms": {"xpaths": [".//div[@col-id='bedrooms']"]},
+    "bathrooms": {"xpaths": [".//div[@col-id='bathrooms']"]},
+    "year_built": {"xpaths": [".//div[@col-id='yearBuilt']"]},
+    "distance": {"xpaths": [".//div[@col-id='distance']"]}
+  }
+}
+#endregion Fields
+
+class PropStream(Site):
+  NAME = "propstream"
+  URL = URL_PROPSTREAM
+  REQUIRES_LOGIN = True
+
+  def __init__(self, driver, config, profiler=None, latencies=None):
+    super().__init__(driver, config, profiler, latencies)
+    #region Constants
+    self.EMAIL = config["propstream"]["email"]
+    self.PASSWORD = config["propstream"]["password"]
+    self.ZOOM = config["propstream"]["zoom"]
+    #endregion Constants
+    self.URL = config["propstream"]["url"]
+
+  def sign_in(self):
+    self.sign_into_propstream(self.EMAIL, self.PASSWORD)
+  # end of sign_in
+
+  def is_signed_in(self):
+    # An expired session gets redirected back to the login page
+    try:
+      self.wait.for_element_located((By.CSS_SELECTOR, SEARCH_INPUT_CSS))
+      return True
+    except TimeoutException:
+      return False
+  # end of is_signed_in
+
+  def ready(self):
+    if (self.ZOOM):
+      self.driver.execute_script(f"document.body.style.zoom='{self.ZOOM}%'")
+    super().ready()
+  # end of ready
+
+  def get_info(self, property_address):
+    return self.get_info_from_propstream(property_address)
+  # end of get_info
+
+  @profiled
+  def sign_into_propstream(self, email, password):
+    wait = self.wait
+    # Autofill email and password fields.
+    input_email = wait.until_clickable((By.CSS_SELECTOR, "input[name='username']"))
+    if (email):
+      input_email.send_keys(email)
+    if (password):
+      input_password_css = "input[name='password']"
+      input_password = wait.until_clickable((By.CSS_SELECTOR, input_password_css))
+      input_password.send_keys(password)
+      submit_css = "button[type='submit']"
+      submit = wait.until_clickable((By.CSS_SELECTOR, submit_css))
+      submit.click()
+    # Wait until property address field after login is clickable
+    wait.for_element_located((By.CSS_SELECTOR, SEARCH_INPUT_CSS), self.TIMEOUT_LOGIN)
+  # end of sign_into_propstream
+
+  @profiled
+  def get_info_from_propstream(self, property_address):
+    driver = self.driver
+    wait = self.wait
+    actions = self.actions
+    # Once in PropStream, look up property address and grab all important information
+    # Search address
+    input_placeholder = "Enter County, City, Zip Code(s) or APN #"
+    input_xpath = f"//input[@placeholder='{input_placeholder}']"
+    input = wait.until_clickable((By.XPATH, input_xpath))
+    input.send_keys(property_address)
+
+    try:
+      # Click Details button
+      details_xpath = "//span[text()='Details']"
+      details = wait.for_element_located((By.XPATH, details_xpath), self.TIMEOUT_SEARCH)
+      actions.move_to_element(details).perform()
+      details.click()
+      self.profiler.branch("propstream.details_button", "clicked")
+    except TimeoutException:
+      self.profiler.branch("propstream.details_button", "timed_out")
+
+    # Wait for the details to load, then grab owner and mortgage info
+    owner_xpath = PROPSTREAM_DETAILS_FIELDS["owner"]["xpaths"][0]
+    wait.for_element_located((By.XPATH, owner_xpath), self.TIMEOUT_SEARCH)
+    details = self.extract(PROPSTREAM_DETAILS_FIELDS)
+    comps_tab_xpath = "//div[text()='Comparables & Nearby Listings']"
+    comps_tab = wait.until_clickable((By.XPATH, comps_tab_xpath))
+    comps_tab.click()
+
+    # Grab distressed condition, owner status, year built and square footage
+    # We don't want to waste our time with bank-owned properties.
+    year_built_xpath = PROPSTREAM_SUMMARY_FIELDS["year_built"]["xpaths"][0]
+    year_built = wait.for_element_located((By.XPATH, year_built_xpath))
+    actions.move_to_element(year_built).perform()
+    summary = self.extract(PROPSTREAM_SUMMARY_FIELDS)
+
+    # Filter by year built
+    year_built = summary["year_built"]
+    if (year_built):
+      input_min_xpath = "//input[@name='yearBuiltMin']"
+      input_min = wait.for_element_located((By.XPATH, input_min_xpath))
+      input_min.send_keys(year_built - 10)
+      input_max_xpath = "//input[@name='yearBuiltMax']"
+      input_max = wait.for_element_located((By.XPATH, input_max_xpath))
+      input_max.send_keys(year_built + 10)
+
+    # Filter by public record
+    public_record = wait.for_element_located((By.XPATH, "//span[text()='Public Record']/preceding-sibling::input"))
+    driver.execute_script("arguments[0].click()", public_record)
+
+    # Setting Sale Date Min doesn't work because date picker is finicky
+    #sale_date_min = driver.find_element(By.CSS_SELECTOR, "input[name='saleDateMin']")
+    #three_months_ago = (datetime.today() - relativedelta(months=3)).replace(day=1).strftime("%m/%d/%Y")
+    #sale_date_min.clear()
+    #sale_date_min.send_keys(three_months_ago)
+
+    # The grid reloads once the filters apply, and reading it before then
+    # gets the unfiltered or a half-refreshed set of comps
+    with self.profiler.stage("propstream.comps_reload"):
+      wait.until_settled(self.TIMEOUT_SEARCH)
+
+    # Grab all comps and take the average
+    # #e4f3e6 is the light green that indicates public record
+    comps = self.extract(PROPSTREAM_COMPS_FIELDS)
+    comps_table, comps_complete = extract_table(driver, PROPSTREAM_COMPS_TABLE)
+    self.profiler.branch("propstream.comps", "complete" if comps_complete else "partial")
+
+    return {
+      "owner": details["owner"],
+      "mortgage": details["mortgage"],
+      "square_footage": summary["square_footage"],
+      "distressed": summary["distressed"],
+      "owner_status": summary["owner_status"],
+      "year_built": summary["year_built"],
+      "bedrooms": summary["bedrooms"],
+      "bathrooms": summary["bathrooms"],
+      "average_sale_price": comps["average_sale_price"],
+      "comps": comps_table,
+      "comps_complete": comps_complete
+    }
+  # end of get_info_from_propstream
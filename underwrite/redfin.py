@@ -0,0 +1,92 @@
+from requests.exceptions import RequestException
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.common.by import By
+from python_utils.functions import cprint
+from python_utils.logging import get_line_number
+from .profiler import profiled
+from .resolver import RedfinAutocomplete, RedfinResolver
+from .site import Site
+
+# Any Redfin home page, listed or not, shows its stats
+HOME_PAGE_XPATH = "//div[contains(@class, 'statsValue')] | //*[@data-rf-test-id='abp-streetLine']"
+
+#region Fields
+# Listing page, once the MLS # has loaded
+REDFIN_LISTING_FIELDS = {
+  "remarks": {"xpaths": ["//div[contains(@class, 'remarks')]/p/span"], "default": "Couldn't locate on Redfin"},
+  "listing_agent": {"xpaths": ["//span[contains(text(), 'Listed by')]/span[1]"]},
+  "listing_brokerage": {"xpaths": ["//span[contains(text(), 'Listed by')]/span[3]"]},
+  "listing_agent_dre": {"xpaths": ["//span[contains(text(), 'Listed by')]/span[2]"]},
+  "ask_price": {"xpaths": ["//div[contains(@class, 'statsValue')]"], "default": "Didn't find on Redfin"},
+  "days_on_market": {
+    "xpaths": ["//span[contains(text(), 'Time on Redfin')]/ancestor::span[contains(@class,'header')]/following-sibling::span"],
+    "default": "Could not find Time on Redfin"
+  }
+}
+#endregion Fields
+
+class Redfin(Site):
+  # Redfin needs no account, so it has no home page to return to. Every
+  # lookup goes straight to the listing URL the resolver finds.
+  NAME = "redfin"
+
+  def __init__(self, driver, config, profiler=None, latencies=None, resolver=None):
+    super().__init__(driver, config, profiler, latencies)
+    #region Constants
+    self.URL_REDFIN = config["redfin"]["url"]
+    self.INDEX_PATH = config["redfin"]["index"]
+    #endregion Constants
+    self.resolver = resolver or RedfinResolver(RedfinAutocomplete(self.URL_REDFIN, self.TIMEOUT_DEFAULT), self.INDEX_PATH)
+
+  def ready(self):
+    # Whatever page the tab is on isn't a home to return to
+    pass
+  # end of ready
+
+  def get_info(self, property_address):
+    return self.get_info_from_redfin(property_address)
+  # end of get_info
+
+  @profiled
+  def get_info_from_redfin(self, property_address):
+    driver = self.driver
+    wait = self.wait
+    try:
+      with self.profiler.stage("redfin.resolve"):
+        redfin_url = self.resolver.resolve(property_address)
+    except (RequestException, ValueError) as e:
+      cprint(f"<r>{e}\n<y>Line {get_line_number()}")
+      self.profiler.branch("redfin.listing", "resolve_failed")
+      raise
+    if not redfin_url:
+      self.profiler.branch("redfin.listing", "not_found")
+      return 1
+    driver.get(redfin_url)
+    try:
+      mls_number = wait.for_element_located((By.XPATH, "//div[contains(@class, 'sourceContent')]/span[2]"), optional=True).text
+    except TimeoutException:
+      self.expect_page(HOME_PAGE_XPATH)
+      self.profiler.branch("redfin.listing", "not_loaded")
+      return 1
+    self.profiler.branch("redfin.listing", "found")
+    listing = self.extract(REDFIN_LISTING_FIELDS)
+
+    # Get Listing Agent Info
+    agent_fields = ("listing_agent", "listing_brokerage", "listing_agent_dre")
+    if all(listing[field] is not None for field in agent_fields):
+      listed_by = f"{listing['listing_brokerage']}, {listing['listing_agent']}, {listing['listing_agent_dre']}"
+    else:
+      listed_by = "Didn't find on Redfin"
+
+    return {
+      "mls_number": mls_number,
+      "remarks": listing["remarks"],
+      "listed_by": listed_by,
+      "listing_agent_phone": "Redfin doesn't show this info",
+      "listing_agent_email": "Redfin doesn't show this info",
+      "ask_price": listing["ask_price"],
+      "days_on_market": "Time on Redfin: " + listing["days_on_market"],
+      "pool": "Redfin doesn't list pool status",
+      "pictures": driver.current_url
+    }
+  # end of get_info_from_redfin
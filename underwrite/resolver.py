@@ -0,0 +1,101 @@
+import json
+import os
+import tempfile
+from urllib.parse import urljoin
+import requests
+from .address import address_parts, normalize_address, normalize_city
+
+URL_REDFIN = "https://www.redfin.com/"
+AUTOCOMPLETE_PATH = "stingray/do/location-autocomplete"
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/107.0.0.0 Safari/537.36"
+
+class RedfinAutocomplete:
+  # Asks Redfin's own location search which page an address lives on.
+  # Any object with a resolve(property_address) method returning a URL or
+  # None can stand in for it, e.g. one pointed at a local stub server.
+
+  def __init__(self, url=URL_REDFIN, timeout=10):
+    self.url = url
+    self.timeout = timeout
+    self.session = requests.Session()
+    self.session.headers["User-Agent"] = USER_AGENT
+
+  def resolve(self, property_address):
+    response = self.session.get(
+      urljoin(self.url, AUTOCOMPLETE_PATH),
+      params={"location": property_address, "v": 2},
+      timeout=self.timeout
+    )
+    response.raise_for_status()
+    # Redfin prefixes its JSON responses with "{}&&"
+    text = response.text
+    if text.startswith("{}&&"):
+      text = text[len("{}&&"):]
+    payload = json.loads(text).get("payload") or {}
+    match = payload.get("exactMatch")
+    if not match:
+      for section in payload.get("sections", []):
+        match = next((row for row in section.get("rows", []) if "/home/" in row.get("url", "") and same_property(row, property_address)), None)
+        if match:
+          break
+    if not match or not match.get("url"):
+      return None
+    return urljoin(self.url, match["url"])
+  # end of resolve
+
+def same_property(row, property_address):
+  # A suggestion is only trusted when it's this very address. Redfin names a
+  # row by its street and unit, with the city and state in subName, while
+  # the address asked for may also carry a city, state and ZIP. A building
+  # row doesn't match a unit in it, since the unit is part of the street.
+  street, city, _, _ = address_parts(property_address)
+  row_street = address_parts(row.get("name", ""))[0]
+  if not row_street or row_street != street:
+    return False
+  row_city = normalize_city(row.get("subName", "").split(",")[0])
+  return not city or not row_city or city == row_city
+# end of same_property
+
+class RedfinResolver:
+  # Maps addresses to Redfin listing URLs, remembering every answer in an
+  # on-disk index so repeat lookups skip the backend entirely.
+
+  def __init__(self, backend, index_path):
+    self.backend = backend
+    self.index_path = index_path
+    self.index = self.load()
+
+  def load(self):
+    try:
+      with open(self.index_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+    except (OSError, ValueError):
+      return {}
+  # end of load
+
+  def save(self):
+    # Merge with whatever other workers have written since this one loaded.
+    # Each save writes its own temp file, since workers may save at once.
+    index = self.load()
+    index.update(self.index)
+    self.index = index
+    fd, path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.index_path)), suffix=".tmp")
+    try:
+      with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(index, f, indent=2)
+      os.replace(path, self.index_path)
+    except:
+      os.remove(path)
+      raise
+  # end of save
+
+  def resolve(self, property_address):
+    key = normalize_address(property_address)
+    if key in self.index:
+      return self.index[key]
+    url = self.backend.resolve(property_address)
+    if url:
+      self.index[key] = url
+      self.save()
+    return url
+  # end of resolve
@@ -0,0 +1,147 @@
+import multiprocessing
+import random
+import time
+from contextlib import contextmanager
+from requests.exceptions import Timeout
+from selenium.common.exceptions import TimeoutException
+
+# Worth trying again, the page or the network was just slow
+RETRY_EXCEPTIONS = (TimeoutException, Timeout)
+
+class SiteUnavailable(RuntimeError):
+  # Raised instead of running a lookup while the site's circuit is open
+  pass
+
+class TokenBucket:
+  # Allows per_minute lookups on average, burst of them back to back, and
+  # at most concurrency at once. The counters live in shared memory, so a
+  # bucket handed to batch workers limits all of them together.
+
+  def __init__(self, per_minute, burst, concurrency):
+    self.interval = 60 / per_minute
+    self.burst = burst
+    self.lock = multiprocessing.Lock()
+    self.tokens = multiprocessing.RawValue("d", burst)
+    self.updated = multiprocessing.RawValue("d", time.time())
+    self.slots = multiprocessing.BoundedSemaphore(concurrency)
+
+  def take(self):
+    # Blocks until a token is free. Returns the seconds spent waiting.
+    waited = 0
+    while True:
+      with self.lock:
+        now = time.time()
+        self.tokens.value = min(self.burst, self.tokens.value + (now - self.updated.value) / self.interval)
+        self.updated.value = now
+        if self.tokens.value >= 1:
+          self.tokens.value -= 1
+          return waited
+        delay = (1 - self.tokens.value) * self.interval
+      time.sleep(delay)
+      waited += delay
+  # end of take
+
+  @contextmanager
+  def slot(self):
+    waited = self.take()
+    self.slots.acquire()
+    try:
+      yield waited
+    finally:
+      self.slots.release()
+  # end of slot
+
+class CircuitBreaker:
+  # Opens after threshold failures in a row and turns lookups away for
+  # cooldown seconds. The first lookup after that is let through on its own:
+  # success closes the circuit, failure opens it for another cooldown.
+
+  def __init__(self, threshold, cooldown):
+    self.threshold = threshold
+    self.cooldown = cooldown
+    self.lock = multiprocessing.Lock()
+    self.failures = multiprocessing.RawValue("i", 0)
+    self.opened_until = multiprocessing.RawValue("d", 0)
+
+  def allow(self):
+    with self.lock:
+      now = time.time()
+      if now < self.opened_until.value:
+        return False
+      if self.failures.value >= self.threshold:
+        # Hold everyone else off while this one tries
+        self.opened_until.value = now + self.cooldown
+      return True
+  # end of allow
+
+  def succeeded(self):
+    with self.lock:
+      self.failures.value = 0
+      self.opened_until.value = 0
+  # end of succeeded
+
+  def failed(self):
+    # Returns whether this failure opened the circuit
+    with self.lock:
+      self.failures.value += 1
+      if self.failures.value >= self.threshold:
+        self.opened_until.value = time.time() + self.cooldown
+        return True
+      return False
+  # end of failed
+
+class Scheduler:
+  # Runs every site lookup through that site's token bucket and circuit
+  # breaker, retrying timeouts with jittered exponential backoff. Create it
+  # once and hand it to every Underwriter that should share the limits.
+
+  def __init__(self, config):
+    #region Constants
+    self.RETRIES = config["scheduler"]["retries"]
+    self.BACKOFF_SECONDS = config["scheduler"]["backoff_seconds"]
+    self.BACKOFF_MAX_SECONDS = config["scheduler"]["backoff_max_seconds"]
+    self.FAILURE_THRESHOLD = config["scheduler"]["failure_threshold"]
+    self.COOLDOWN_SECONDS = config["scheduler"]["cooldown_seconds"]
+    #endregion Constants
+    self.buckets = {}
+    self.breakers = {}
+    for name in ("propstream", "compass", "redfin"):
+      limits = config["scheduler"][name]
+      self.buckets[name] = TokenBucket(limits["per_minute"], limits["burst"], limits["concurrency"])
+      self.breakers[name] = CircuitBreaker(self.FAILURE_THRESHOLD, self.COOLDOWN_SECONDS)
+
+  def lookup(self, site, property_address):
+    breaker = self.breakers[site.NAME]
+    if not breaker.allow():
+      site.profiler.branch(f"{site.NAME}.circuit", "open")
+      raise SiteUnavailable(f"{site.NAME} is paused after {self.FAILURE_THRESHOLD} failed lookups in a row")
+    attempt = 0
+    while True:
+      try:
+        with self.buckets[site.NAME].slot() as waited:
+          site.profiler.record("stages", f"{site.NAME}.rate_limited", waited)
+          result = site.lookup(property_address)
+      except RETRY_EXCEPTIONS:
+        if attempt < self.RETRIES:
+          site.profiler.branch(f"{site.NAME}.retry", f"attempt {attempt + 2}")
+          time.sleep(self.backoff(attempt))
+          attempt += 1
+          continue
+        self.fail(site)
+        raise
+      except Exception:
+        self.fail(site)
+        raise
+      breaker.succeeded()
+      return result
+  # end of lookup
+
+  def fail(self, site):
+    if self.breakers[site.NAME].failed():
+      site.profiler.branch(f"{site.NAME}.circuit", "opened")
+  # end of fail
+
+  def backoff(self, attempt):
+    # Full jitter, so workers that timed out together don't retry together
+    return random.uniform(0, min(self.BACKOFF_MAX_SECONDS, self.BACKOFF_SECONDS * 2 ** attempt))
+  # end of backoff
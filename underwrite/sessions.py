@@ -0,0 +1,95 @@
+import json
+import os
+import tempfile
+import time
+
+# Runs before any of the page's own scripts so the app boots with its saved
+# local storage already in place.
+LOCAL_STORAGE_SCRIPT = """
+(function(origin, items) {
+  if (window.location.origin !== origin) return;
+  for (var key in items) {
+    try { window.localStorage.setItem(key, items[key]); } catch (e) {}
+  }
+})(%s, %s);
+"""
+
+class SessionStore:
+  # Saves each site's cookies and local storage to disk after a login so
+  # later runs and workers can skip the login flow entirely.
+
+  def __init__(self, directory):
+    self.directory = directory
+    os.makedirs(directory, exist_ok=True)
+
+  def path(self, site):
+    return os.path.join(self.directory, f"{site.NAME}.json")
+  # end of path
+
+  def save(self, site):
+    driver = site.driver
+    session = {
+      "home": driver.current_url,
+      "origin": driver.execute_script("return window.location.origin;"),
+      "cookies": driver.get_cookies(),
+      "local_storage": driver.execute_script("return Object.assign({}, window.localStorage);"),
+      "saved_at": time.time()
+    }
+    # Write then rename so a worker never reads a half-written session. Each
+    # save gets its own temp file, since workers sign in at the same time.
+    fd, path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+    try:
+      with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(session, f)
+      os.replace(path, self.path(site))
+    except:
+      os.remove(path)
+      raise
+  # end of save
+
+  def load(self, site):
+    try:
+      with open(self.path(site), "r", encoding="utf-8") as f:
+        return json.load(f)
+    except (OSError, ValueError):
+      return None
+  # end of load
+
+  def restore(self, site, new_tab=False):
+    # Returns True when the saved session was loaded and is still signed in.
+    # Costs a single page load either way.
+    session = self.load(site)
+    if not session:
+      return False
+    driver = site.driver
+    # Like URL blocking, on-new-document scripts belong to a single tab, so
+    # the tab has to exist before the script is registered
+    if new_tab:
+      site.open(True, "about:blank")
+    driver.execute_cdp_cmd("Network.setCookies", {"cookies": [to_cdp_cookie(cookie) for cookie in session["cookies"]]})
+    script = driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {
+      "source": LOCAL_STORAGE_SCRIPT % (json.dumps(session["origin"]), json.dumps(session["local_storage"]))
+    })
+    try:
+      site.open(False, session["home"])
+    finally:
+      driver.execute_cdp_cmd("Page.removeScriptToEvaluateOnNewDocument", {"identifier": script["identifier"]})
+    return site.is_signed_in()
+  # end of restore
+
+def to_cdp_cookie(cookie):
+  # Selenium and the DevTools protocol name a couple of cookie fields differently
+  cdp_cookie = {
+    "name": cookie["name"],
+    "value": cookie["value"],
+    "domain": cookie["domain"],
+    "path": cookie.get("path", "/"),
+    "secure": cookie.get("secure", False),
+    "httpOnly": cookie.get("httpOnly", False)
+  }
+  if "expiry" in cookie:
+    cdp_cookie["expires"] = cookie["expiry"]
+  if cookie.get("sameSite") in ("Strict", "Lax", "None"):
+    cdp_cookie["sameSite"] = cookie["sameSite"]
+  return cdp_cookie
+# end of to_cdp_cookie
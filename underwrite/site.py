@@ -0,0 +1,98 @@
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.common.action_chains import ActionChains
+from selenium.webdriver.common.by import By
+from selenium_utils import JavaScript
+from .browser import prepare_tab
+from .extract import extract_matched
+from .profiler import Profiler
+from .waits import AdaptiveWait, WaitLatencies
+
+class Site:
+  # A website scraped through a driver. Several sites may share one driver,
+  # in which case each one keeps to its own tab.
+  NAME = ""
+  URL = ""
+  REQUIRES_LOGIN = False
+
+  def __init__(self, driver, config, profiler=None, latencies=None):
+    self.driver = driver
+    self.config = config
+    self.profiler = profiler or Profiler(enabled=False)
+    self.actions = ActionChains(driver)
+    self.js = JavaScript(driver)
+    #region Constants
+    self.TIMEOUT_DEFAULT = config["timeouts"]["default"]
+    self.TIMEOUT_LOGIN = config["timeouts"]["login"]
+    self.TIMEOUT_SEARCH = config["timeouts"]["search"]
+    #endregion Constants
+    self.wait = self.profiler.wrap_wait(AdaptiveWait(driver, self.TIMEOUT_DEFAULT, config, latencies or WaitLatencies(config)))
+    self.tab = None
+    self.home = None
+
+  def open(self, new_tab=False, url=None):
+    # Load the site in the current tab, or in a new one when the driver
+    # already has another site open.
+    url = url or self.URL
+    if new_tab:
+      self.driver.execute_script(f"window.open('{url}');")
+      self.driver.switch_to.window(self.driver.window_handles[len(self.driver.window_handles) - 1])
+      prepare_tab(self.driver, self.config)
+    elif url:
+      self.driver.get(url)
+    self.tab = self.driver.current_window_handle
+  # end of open
+
+  def sign_in(self):
+    # Sites that need an account override this along with is_signed_in
+    pass
+  # end of sign_in
+
+  def is_signed_in(self):
+    return True
+  # end of is_signed_in
+
+  def ready(self):
+    # Called once the site is signed in, whether by logging in or by
+    # restoring a saved session. The page it lands on is where every lookup
+    # starts from.
+    self.home = self.driver.current_url
+  # end of ready
+
+  def activate(self):
+    if self.tab and self.driver.current_window_handle != self.tab:
+      self.driver.switch_to.window(self.tab)
+  # end of activate
+
+  def reset(self):
+    # Send the tab back to its post-login page so the search input is
+    # available no matter where the previous lookup left it.
+    self.activate()
+    if self.home and self.driver.current_url != self.home:
+      self.driver.get(self.home)
+  # end of reset
+
+  def lookup(self, property_address):
+    self.reset()
+    return self.get_info(property_address)
+  # end of lookup
+
+  def get_info(self, property_address):
+    raise NotImplementedError
+  # end of get_info
+
+  def expect_page(self, xpath):
+    # A page that settled without a listing only means there is none if it's
+    # one the site shows for that. Anything else, like a block or captcha
+    # page, raises a timeout so the lookup is retried.
+    if not self.driver.find_elements(By.XPATH, xpath):
+      self.profiler.branch(f"{self.NAME}.listing", "unrecognized_page")
+      raise TimeoutException(f"{self.NAME} showed neither a listing nor a page without one")
+  # end of expect_page
+
+  def extract(self, fields):
+    # Records which XPath candidate each field was found by
+    values, matched = extract_matched(self.driver, fields)
+    for name, index in matched.items():
+      self.profiler.branch(f"{self.NAME}.{name}", f"xpath {index + 1}" if index >= 0 else "missing")
+    return values
+  # end of extract
@@ -0,0 +1,177 @@
+import datetime
+import json
+import sqlite3
+import time
+from .address import ADDRESS_KEY_VERSION, normalize_address
+from .cache import decode, encode
+
+# Fields compared between runs of the same address. Comps are left out,
+# their effect shows up in the ARV.
+DIFF_FIELDS = {
+  "propstream_info": ["owner", "mortgage", "square_footage", "distressed", "owner_status", "year_built", "bedrooms", "bathrooms", "average_sale_price"],
+  "listing_info": ["mls_number", "ask_price", "days_on_market", "listed_by", "listing_agent_phone", "listing_agent_email", "remarks", "pool", "pictures"]
+}
+
+SELECT_RUNS = "SELECT id, property_address, underwritten_at, source, propstream_info, listing_info, notes_file FROM runs"
+
+class UnderwritingStore:
+  # Every underwriting run, kept in SQLite with what each site returned, when
+  # and how it was run. Notes are rendered from a run whenever they're
+  # needed, so the markdown files are just copies.
+
+  def __init__(self, path):
+    self.connection = sqlite3.connect(path, timeout=30)
+    self.connection.execute("PRAGMA journal_mode=WAL")
+    self.connection.executescript("""
+      CREATE TABLE IF NOT EXISTS runs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        property_address TEXT NOT NULL,
+        address_key TEXT NOT NULL,
+        underwritten_at REAL NOT NULL,
+        source TEXT NOT NULL,
+        mls_number TEXT,
+        distressed TEXT,
+        propstream_info TEXT NOT NULL,
+        listing_info TEXT NOT NULL,
+        notes_file TEXT
+      );
+      CREATE INDEX IF NOT EXISTS runs_address ON runs (address_key, underwritten_at);
+      CREATE INDEX IF NOT EXISTS runs_date ON runs (underwritten_at);
+      CREATE INDEX IF NOT EXISTS runs_mls_number ON runs (mls_number);
+      CREATE INDEX IF NOT EXISTS runs_distressed ON runs (distressed COLLATE NOCASE);
+    """)
+    self.connection.commit()
+    if self.connection.execute("PRAGMA user_version").fetchone()[0] < ADDRESS_KEY_VERSION:
+      self.rekey()
+
+  def rekey(self):
+    # Runs stored before normalize_address last changed are under stale keys
+    addresses = [row[0] for row in self.connection.execute("SELECT DISTINCT property_address FROM runs")]
+    self.connection.executemany(
+      "UPDATE runs SET address_key = ? WHERE property_address = ?",
+      [(normalize_address(property_address), property_address) for property_address in addresses]
+    )
+    self.connection.execute(f"PRAGMA user_version = {ADDRESS_KEY_VERSION}")
+    self.connection.commit()
+  # end of rekey
+
+  def add(self, result, source):
+    # source says how the run was made, e.g. "single", "batch" or "daemon"
+    propstream_info = result["propstream_info"]
+    listing_info = result["listing_info"]
+    cursor = self.connection.execute(
+      """INSERT INTO runs (property_address, address_key, underwritten_at, source, mls_number, distressed, propstream_info, listing_info)
+      VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+      (
+        result["property_address"], normalize_address(result["property_address"]), time.time(), source,
+        listing_info.get("mls_number"), propstream_info.get("distressed"),
+        json.dumps(propstream_info, default=encode), json.dumps(listing_info, default=encode)
+      )
+    )
+    self.connection.commit()
+    return self.run(cursor.lastrowid)
+  # end of add
+
+  def set_notes_file(self, run_id, notes_file):
+    self.connection.execute("UPDATE runs SET notes_file = ? WHERE id = ?", (notes_file, run_id))
+    self.connection.commit()
+  # end of set_notes_file
+
+  def run(self, run_id):
+    rows = self.select("WHERE id = ?", (run_id,))
+    return rows[0] if rows else None
+  # end of run
+
+  def history(self, property_address):
+    # Every run for an address, oldest first
+    return self.select("WHERE address_key = ? ORDER BY underwritten_at", (normalize_address(property_address),))
+  # end of history
+
+  def latest(self, property_address):
+    rows = self.select("WHERE address_key = ? ORDER BY underwritten_at DESC LIMIT 1", (normalize_address(property_address),))
+    return rows[0] if rows else None
+  # end of latest
+
+  def count(self, property_address):
+    return self.connection.execute(
+      "SELECT COUNT(*) FROM runs WHERE address_key = ?", (normalize_address(property_address),)
+    ).fetchone()[0]
+  # end of count
+
+  def find(self, property_address=None, mls_number=None, distressed=None, since=None, until=None):
+    # Runs matching every filter given, newest first. since and until are
+    # dates, both inclusive.
+    where, params = self.where(property_address, mls_number, distressed, since, until)
+    return self.select(f"{where}ORDER BY underwritten_at DESC", params)
+  # end of find
+
+  def chunks(self, size, property_address=None, mls_number=None, distressed=None, since=None, until=None):
+    # Yields the runs find() would return, oldest first, size at a time.
+    # Only one chunk is held in memory, however many runs match.
+    where, params = self.where(property_address, mls_number, distressed, since, until)
+    cursor = self.connection.execute(f"{SELECT_RUNS} {where}ORDER BY id", params)
+    while True:
+      rows = cursor.fetchmany(size)
+      if not rows:
+        return
+      yield [run_from_row(row) for row in rows]
+  # end of chunks
+
+  def where(self, property_address, mls_number, distressed, since, until):
+    clauses = []
+    params = []
+    if property_address:
+      clauses.append("address_key = ?")
+      params.append(normalize_address(property_address))
+    if mls_number:
+      clauses.append("mls_number = ?")
+      params.append(mls_number)
+    if distressed:
+      clauses.append("distressed = ? COLLATE NOCASE")
+      params.append(distressed)
+    if since:
+      clauses.append("underwritten_at >= ?")
+      params.append(datetime.datetime.combine(since, datetime.time.min).timestamp())
+    if until:
+      clauses.append("underwritten_at < ?")
+      params.append(datetime.datetime.combine(until + datetime.timedelta(days=1), datetime.time.min).timestamp())
+    where = f"WHERE {' AND '.join(clauses)} " if clauses else ""
+    return where, params
+  # end of where
+
+  def select(self, clause, params):
+    rows = self.connection.execute(f"{SELECT_RUNS} {clause}", params).fetchall()
+    return [run_from_row(row) for row in rows]
+  # end of select
+
+  def close(self):
+    self.connection.close()
+  # end of close
+
+def run_from_row(row):
+  return {
+    "id": row[0],
+    "property_address": row[1],
+    "underwritten_at": row[2],
+    "source": row[3],
+    "propstream_info": json.loads(row[4], object_hook=decode),
+    "listing_info": json.loads(row[5], object_hook=decode),
+    "notes_file": row[6]
+  }
+# end of run_from_row
+
+def diff_runs(old, new):
+  # {field: (old value, new value)} for every field that changed
+  changes = {}
+  for info, fields in DIFF_FIELDS.items():
+    for field in fields:
+      before = old[info].get(field)
+      after = new[info].get(field)
+      if before != after:
+        changes[field] = (before, after)
+  return changes
+# end of diff_runs
+
+def run_date(run):
+  return datetime.datetime.fromtimestamp(run["underwritten_at"]).strftime('%m/%d/%y')
+# end of run_date
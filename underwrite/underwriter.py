@@ -0,0 +1,267 @@
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from selenium.common.exceptions import WebDriverException
+from urllib3.exceptions import HTTPError
+from .browser import initialize_driver
+from .compass import Compass
+from .propstream import PropStream
+from .cache import ResultCache
+from .profiler import Profiler
+from .redfin import Redfin
+from .scheduler import Scheduler, SiteUnavailable
+from .sessions import SessionStore
+from .waits import WaitLatencies
+
+LISTING_NOT_FOUND = {
+  "mls_number": "Couldn't find on Compass or Redfin",
+  "remarks": "Couldn't find on Compass or Redfin",
+  "listed_by": "Couldn't find on Compass or Redfin",
+  "listing_agent_phone": "Couldn't find on Compass or Redfin",
+  "listing_agent_email": "Couldn't find on Compass or Redfin",
+  "ask_price": "Couldn't find on Compass or Redfin",
+  "days_on_market": "DOM: Couldn't find on Compass or Redfin",
+  "pool": "Couldn't find on Compass or Redfin",
+  "pictures": "Couldn't find on Compass or Redfin"
+}
+
+class Underwriter:
+  # Logs into PropStream and Compass once in start(), after which underwrite()
+  # can be called for as many addresses as needed.
+  #
+  # Sequential: one driver with a PropStream tab and a Compass tab. Redfin is
+  # only tried in the Compass tab after Compass comes up empty.
+  # Concurrent: PropStream, Compass and Redfin each get their own driver and
+  # are queried at the same time. The first listing site to find the
+  # property wins, so a lookup takes about as long as the slowest source.
+  #
+  # With listing_only, PropStream is never opened and only refresh_listing()
+  # can be used.
+  #
+  # Every lookup goes through scheduler, which rate limits and retries it
+  # and pauses a site that keeps failing. Pass the same scheduler to
+  # Underwriters that should share limits.
+
+  def __init__(self, config, profiler=None, listing_only=False, scheduler=None):
+    self.config = config
+    self.listing_only = listing_only
+    self.scheduler = scheduler or Scheduler(config)
+    self.profiler = profiler or Profiler(enabled=False)
+    #region Constants
+    self.CONCURRENT = config["browser"]["concurrent"]
+    self.SESSIONS_ENABLED = config["sessions"]["enabled"]
+    self.SESSIONS_DIRECTORY = config["sessions"]["directory"]
+    self.CACHE_ENABLED = config["cache"]["enabled"]
+    self.CACHE_PATH = config["cache"]["path"]
+    self.CACHE_TTL_HOURS = config["cache"]["ttl_hours"]
+    #endregion Constants
+    self.started = False
+    self.drivers = []
+    self.executors = {}
+    self.sessions = SessionStore(self.SESSIONS_DIRECTORY) if self.SESSIONS_ENABLED else None
+    self.cache = ResultCache(self.CACHE_PATH, self.CACHE_TTL_HOURS) if self.CACHE_ENABLED else None
+    self.latencies = WaitLatencies(config)
+
+  def start(self):
+    # Browsers are only launched once an address actually needs scraping,
+    # so addresses answered entirely from the cache never start Chrome
+    if self.started:
+      return
+    try:
+      self.start_sites()
+    except:
+      self.quit()
+      raise
+    self.started = True
+  # end of start
+
+  def start_sites(self):
+    if self.CONCURRENT:
+      if not self.listing_only:
+        self.propstream = PropStream(self.initialize_driver(), self.config, self.profiler, self.latencies)
+      self.compass = Compass(self.initialize_driver(), self.config, self.profiler, self.latencies)
+      self.redfin = Redfin(self.initialize_driver(), self.config, self.profiler, self.latencies)
+      # A driver can only run one command at a time, so each site gets a
+      # single thread. A lookup that lost the race simply finishes in the
+      # background before that site's next lookup starts.
+      sites = (self.compass, self.redfin) if self.listing_only else (self.propstream, self.compass, self.redfin)
+      for site in sites:
+        self.executors[site] = ThreadPoolExecutor(max_workers=1)
+      futures = [self.submit(site, self.open_site, site) for site in self.executors]
+      for future in futures:
+        future.result()
+    else:
+      driver = self.initialize_driver()
+      self.compass = Compass(driver, self.config, self.profiler, self.latencies)
+      self.redfin = Redfin(driver, self.config, self.profiler, self.latencies)
+      if self.listing_only:
+        self.open_site(self.compass)
+      else:
+        self.propstream = PropStream(driver, self.config, self.profiler, self.latencies)
+        self.open_site(self.propstream)
+        self.open_site(self.compass, new_tab=True)
+      # Redfin takes over the Compass tab whenever Compass comes up empty
+      self.open_site(self.redfin)
+  # end of start_sites
+
+  def initialize_driver(self):
+    with self.profiler.stage("initialize_driver"):
+      driver = self.profiler.instrument(initialize_driver(self.config))
+    self.drivers.append(driver)
+    return driver
+  # end of initialize_driver
+
+  def open_site(self, site, new_tab=False):
+    # A saved session only costs one page load to check, so try it before
+    # going through the full login
+    restored = False
+    if site.REQUIRES_LOGIN and self.sessions:
+      with self.profiler.stage(f"{site.NAME}.restore_session"):
+        restored = self.sessions.restore(site, new_tab)
+      self.profiler.branch(f"{site.NAME}.session", "restored" if restored else "signed_in")
+    if not restored:
+      # A failed restore has already opened the site's tab
+      site.open(new_tab and site.tab is None)
+      site.sign_in()
+      if site.REQUIRES_LOGIN and self.sessions:
+        self.sessions.save(site)
+    site.ready()
+  # end of open_site
+
+  def submit(self, site, fn, *args):
+    return self.executors[site].submit(fn, *args)
+  # end of submit
+
+  def quit(self):
+    for executor in self.executors.values():
+      executor.shutdown(wait=False, cancel_futures=True)
+    self.executors = {}
+    for driver in self.drivers:
+      try:
+        driver.quit()
+      except Exception:
+        # The browser may already be gone, which is often why it's quitting
+        pass
+    self.drivers = []
+    self.started = False
+  # end of quit
+
+  def close(self):
+    self.quit()
+    self.latencies.save()
+    if self.cache:
+      self.cache.close()
+  # end of close
+
+  def underwrite(self, property_address):
+    # Grab everything needed for the notes of a single property. Sources
+    # with fresh cached results are not scraped again.
+    propstream_info = self.cache.get(property_address, "propstream") if self.cache else None
+    listing_info = self.cache.get(property_address, "listing") if self.cache else None
+    self.profiler.branch("cache.propstream", "miss" if propstream_info is None else "hit")
+    self.profiler.branch("cache.listing", "miss" if listing_info is None else "hit")
+    if propstream_info is None or listing_info is None:
+      self.start()
+
+    if self.CONCURRENT:
+      propstream_future = None
+      if propstream_info is None:
+        propstream_future = self.submit(self.propstream, self.scheduler.lookup, self.propstream, property_address)
+      if listing_info is None:
+        listing_info = self.cache_listing_info(property_address, self.get_listing_info(property_address))
+      if propstream_future:
+        propstream_info = self.cache_propstream_info(property_address, propstream_future.result())
+    else:
+      if propstream_info is None:
+        propstream_info = self.cache_propstream_info(property_address, self.scheduler.lookup(self.propstream, property_address))
+      if listing_info is None:
+        listing_info = self.cache_listing_info(property_address, self.get_listing_info(property_address))
+
+    return {
+      "property_address": property_address,
+      "propstream_info": propstream_info,
+      "listing_info": listing_info
+    }
+  # end of underwrite
+
+  def refresh_listing(self, property_address):
+    # Scrape just the listing again, however fresh the cached one is
+    self.start()
+    return {
+      "property_address": property_address,
+      "listing_info": self.cache_listing_info(property_address, self.get_listing_info(property_address))
+    }
+  # end of refresh_listing
+
+  def get_listing_info(self, property_address):
+    # Redfin is tried when Compass comes up empty, fails or is paused. Only
+    # when both sites fail is it an error rather than a missing listing.
+    if self.CONCURRENT:
+      return self.get_listing_info_concurrently(property_address)
+    errors = []
+    for site in (self.compass, self.redfin):
+      try:
+        listing_info = self.scheduler.lookup(site, property_address)
+      except Exception as e:
+        errors.append(e)
+        continue
+      if listing_info != 1:
+        self.profiler.branch("listing.source", site.NAME)
+        return listing_info
+    if len(errors) == 2:
+      raise listing_error(errors)
+    self.profiler.branch("listing.source", "not_found")
+    return 1
+  # end of get_listing_info
+
+  def cache_propstream_info(self, property_address, propstream_info):
+    if self.cache:
+      self.cache.put(property_address, "propstream", propstream_info)
+    return propstream_info
+  # end of cache_propstream_info
+
+  def cache_listing_info(self, property_address, listing_info):
+    # A listing neither site found may just be a site having a bad moment,
+    # so only listings that were actually found get cached
+    if listing_info == 1:
+      return dict(LISTING_NOT_FOUND)
+    if self.cache:
+      self.cache.put(property_address, "listing", listing_info)
+    return listing_info
+  # end of cache_listing_info
+
+  def get_listing_info_concurrently(self, property_address):
+    # Query Compass and Redfin speculatively and keep whichever finds the
+    # listing first. A site that errors counts as not finding it, unless
+    # both do.
+    pending = {
+      self.submit(site, self.scheduler.lookup, site, property_address): site
+      for site in (self.compass, self.redfin)
+    }
+    errors = []
+    while pending:
+      done, _ = wait(pending, return_when=FIRST_COMPLETED)
+      for future in done:
+        site = pending.pop(future)
+        if future.exception() is not None:
+          errors.append(future.exception())
+        elif future.result() != 1:
+          self.profiler.branch("listing.source", site.NAME)
+          return future.result()
+    if len(errors) == 2:
+      raise listing_error(errors)
+    self.profiler.branch("listing.source", "not_found")
+    return 1
+  # end of get_listing_info_concurrently
+
+def listing_error(errors):
+  # When both listing sites failed, a browser failure is the one worth
+  # raising, so the caller knows to start the browsers over
+  return next((e for e in errors if not isinstance(e, SiteUnavailable)), errors[-1])
+# end of listing_error
+
+def browser_failed(error):
+  # Only a crashed browser or a session that expired mid-lookup leaves the
+  # sites in an unknown state. Starting them over for anything else, like a
+  # site paused by its circuit breaker, costs a relaunch and logins for
+  # nothing. A chromedriver that died shows up as a failed connection to it.
+  return isinstance(error, (WebDriverException, HTTPError, ConnectionError))
+# end of browser_failed
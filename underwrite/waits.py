@@ -0,0 +1,163 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from selenium.common.exceptions import NoSuchElementException, StaleElementReferenceException, TimeoutException, WebDriverException
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium_utils import Wait
+
+# Sites need this many successful waits on a locator before its learned
+# timeout is trusted
+MIN_SAMPLES = 3
+
+# True once the page has loaded, has no fetch/XHR requests in flight and
+# its DOM hasn't changed for arguments[0] milliseconds. The watcher is
+# installed by the first call on each document. With arguments[1], the page
+# counts as having just changed, for changes the DOM doesn't show, like
+# typing into a filter.
+SETTLED_SCRIPT = """
+var settleMs = arguments[0];
+if (!window.__underwriteWatch) {
+  var watch = window.__underwriteWatch = {lastChange: performance.now(), pending: 0};
+  var touch = function() { watch.lastChange = performance.now(); };
+  new MutationObserver(touch).observe(document, {childList: true, subtree: true, attributes: true, characterData: true});
+  var fetch = window.fetch;
+  if (fetch) {
+    window.fetch = function() {
+      watch.pending++;
+      return fetch.apply(this, arguments).finally(function() { watch.pending--; touch(); });
+    };
+  }
+  var send = XMLHttpRequest.prototype.send;
+  XMLHttpRequest.prototype.send = function() {
+    watch.pending++;
+    this.addEventListener("loadend", function() { watch.pending--; touch(); });
+    return send.apply(this, arguments);
+  };
+}
+var watch = window.__underwriteWatch;
+if (arguments[1]) watch.lastChange = performance.now();
+return document.readyState === "complete" && watch.pending === 0 && performance.now() - watch.lastChange >= settleMs;
+"""
+
+class AdaptiveWait:
+  # Explicit waits that poll every waits->poll_seconds instead of relying on
+  # an implicit wait. Anything it doesn't override is handed to the
+  # selenium_utils.Wait it wraps.
+  #
+  # A wait marked optional is for an element the page may simply not have,
+  # like a listing that isn't on the site. Once the page has settled and the
+  # wait has run longer than that locator usually takes (or
+  # waits->floor_seconds before there's a history), the element is declared
+  # missing right away instead of waiting out the full timeout.
+
+  def __init__(self, driver, timeout, config, latencies):
+    self.driver = driver
+    self.timeout = timeout
+    self.latencies = latencies
+    self.wait = Wait(driver, timeout)
+    #region Constants
+    self.POLL_SECONDS = config["waits"]["poll_seconds"]
+    self.SETTLE_SECONDS = config["waits"]["settle_seconds"]
+    self.FLOOR_SECONDS = config["waits"]["floor_seconds"]
+    #endregion Constants
+
+  def __getattr__(self, name):
+    return getattr(self.wait, name)
+  # end of __getattr__
+
+  def for_element_located(self, locator, timeout=None, optional=False):
+    return self.until(locator, EC.presence_of_element_located, timeout, optional)
+  # end of for_element_located
+
+  def until_clickable(self, locator, timeout=None, optional=False):
+    return self.until(locator, EC.element_to_be_clickable, timeout, optional)
+  # end of until_clickable
+
+  def until(self, locator, condition, timeout, optional):
+    start = time.perf_counter()
+    floor = self.latencies.timeout(locator) or self.FLOOR_SECONDS
+    def check(driver):
+      try:
+        element = condition(locator)(driver)
+      except (NoSuchElementException, StaleElementReferenceException):
+        element = False
+      if element:
+        return element
+      if optional and time.perf_counter() - start >= floor and self.settled():
+        raise TimeoutException(f"{locator[1]} isn't on the page")
+      return False
+    element = WebDriverWait(self.driver, timeout or self.timeout, poll_frequency=self.POLL_SECONDS).until(check)
+    self.latencies.record(locator, time.perf_counter() - start)
+    return element
+  # end of until
+
+  def settled(self, changed=False):
+    try:
+      return self.driver.execute_script(SETTLED_SCRIPT, self.SETTLE_SECONDS * 1000, changed)
+    except WebDriverException:
+      # Mid-navigation, the old document is gone before the new one is ready
+      return False
+  # end of settled
+
+  def until_settled(self, timeout=None):
+    # Waits out whatever the last interaction set off, e.g. a grid reloading
+    # after its filters changed
+    self.settled(changed=True)
+    WebDriverWait(self.driver, timeout or self.timeout, poll_frequency=self.POLL_SECONDS).until(lambda driver: self.settled())
+  # end of until_settled
+
+class WaitLatencies:
+  # Remembers how long each locator took to show up, across runs, so
+  # optional waits know how long is too long for that locator in particular.
+
+  def __init__(self, config):
+    self.lock = threading.Lock()
+    #region Constants
+    self.PATH = config["waits"]["path"]
+    self.SAMPLES = config["waits"]["samples"]
+    self.MARGIN = config["waits"]["margin"]
+    #endregion Constants
+    self.latencies = self.load()
+
+  def load(self):
+    try:
+      with open(self.PATH, "r", encoding="utf-8") as f:
+        return json.load(f)
+    except (OSError, ValueError):
+      return {}
+  # end of load
+
+  def save(self):
+    # Merge with whatever other workers have written since this one loaded.
+    # Each save writes its own temp file, since workers all save at once.
+    with self.lock:
+      latencies = self.load()
+      latencies.update(self.latencies)
+      fd, path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.PATH)), suffix=".tmp")
+      try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+          json.dump(latencies, f, indent=2)
+        os.replace(path, self.PATH)
+      except:
+        os.remove(path)
+        raise
+  # end of save
+
+  def record(self, locator, seconds):
+    with self.lock:
+      recent = self.latencies.setdefault(f"{locator[0]}={locator[1]}", [])
+      recent.append(round(seconds, 3))
+      del recent[:-self.SAMPLES]
+  # end of record
+
+  def timeout(self, locator):
+    # The slowest recent wait with some margin, or None without enough history
+    with self.lock:
+      recent = self.latencies.get(f"{locator[0]}={locator[1]}", [])
+      if len(recent) < MIN_SAMPLES:
+        return None
+      return max(recent) * self.MARGIN
+  # end of timeout